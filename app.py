@@ -12,6 +12,10 @@ from invitations import invitations_bp
 from events import events_bp, check_event_reminders
 from payments import payments_bp
 from user_services import check_membership_expiration
+from member_directory import sync_member_directory
+from facebook_sync import SYNC_JOB_ID, sync_facebook_page_events
+from email_outbox import start_outbox_worker
+from job_lock import run_exclusive
 
 def create_app():
     """
@@ -90,25 +94,50 @@ def create_app():
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response
 
-    # Scheduler jobs
+    # Scheduler jobs run in an app context (so emails can be rendered outside a request)
+    # and on only one worker/instance per run, via the distributed job lock
+    def single_runner(job_id, func, min_interval):
+        def run():
+            with app.app_context():
+                return run_exclusive(job_id, func, min_interval)
+        return run
+
     scheduler = APScheduler()
     scheduler.init_app(app)
     scheduler.add_job(
-        func=check_membership_expiration,
+        func=single_runner('expiration_check', check_membership_expiration, 12 * 3600),
         trigger='cron',
         hour=6,
         minute=30,
         id='expiration_check'
     )
     scheduler.add_job(
-        func=check_event_reminders,
+        func=single_runner('event_reminder', check_event_reminders, 12 * 3600),
         trigger='cron',
         hour=1,
         minute=37,
         id='event_reminder'
     )
+    scheduler.add_job(
+        func=single_runner('member_directory_sync', sync_member_directory, 25 * 60),
+        trigger='interval',
+        minutes=30,
+        id='member_directory_sync'
+    )
+    # Minimum spacing between Facebook syncs (seconds): 80% of the interval, so a tick
+    # that fires a little early on another worker still runs
+    facebook_min_interval = int(config.Config.FACEBOOK_SYNC_MINUTES * 60 * 0.8)
+    scheduler.add_job(
+        func=single_runner(SYNC_JOB_ID, sync_facebook_page_events, facebook_min_interval),
+        trigger='interval',
+        minutes=config.Config.FACEBOOK_SYNC_MINUTES,
+        id=SYNC_JOB_ID
+    )
     scheduler.start()
 
+    # Background delivery of queued emails
+    start_outbox_worker()
+
     return app
 
 # Create application instance for WSGI
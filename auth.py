@@ -4,9 +4,12 @@ Authentication blueprint: routes for user login, logout, and session management
 from flask import Blueprint, request, session, redirect, url_for, flash, jsonify, current_app
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 from urllib.parse import quote
-import msal, requests, os
+import msal, os
 from datetime import datetime
 from config import Config
+from graph_auth import acquire_graph_api_token
+import http_client
+from session_validity import SessionValidityCache
 
 # Blueprint for authentication routes and user session management
 auth_bp = Blueprint('auth', __name__)
@@ -50,7 +53,9 @@ def _build_auth_code_flow():
     app_msal = msal.ConfidentialClientApplication(
         Config.CLIENT_ID,
         client_credential=Config.CLIENT_SECRET,
-        authority=Config.AUTHORITY
+        authority=Config.AUTHORITY,
+        http_client=http_client.get_session(),
+        timeout=Config.HTTP_READ_TIMEOUT
     )
     return app_msal.initiate_auth_code_flow([], redirect_uri=Config.REDIRECT_URI)
 
@@ -58,45 +63,60 @@ def _acquire_token_by_auth_code_flow(flow, args):
     app_msal = msal.ConfidentialClientApplication(
         Config.CLIENT_ID,
         client_credential=Config.CLIENT_SECRET,
-        authority=Config.AUTHORITY
+        authority=Config.AUTHORITY,
+        http_client=http_client.get_session(),
+        timeout=Config.HTTP_READ_TIMEOUT
     )
     result = app_msal.acquire_token_by_auth_code_flow(flow, args)
     if "id_token" in result:
         return result.get("id_token_claims")
     return None
 
-def _acquire_graph_api_token():
-    # Use AAD authority (tenant endpoint) for client credential flow to call Graph API
-    authority_url = Config.AAD_AUTHORITY
-    app_msal = msal.ConfidentialClientApplication(
-        Config.CLIENT_ID,
-        client_credential=Config.CLIENT_SECRET,
-        authority=authority_url
-    )
-    result = app_msal.acquire_token_for_client(
-        scopes=["https://graph.microsoft.com/.default"]
-    )
-    return result.get("access_token")
-
-def user_still_exists(email):
-    token = _acquire_graph_api_token()
+def users_still_exist(emails):
+    """
+    Check which signed-in users still exist in B2C, for the session validity cache.
+    Returns {email: bool}; raises if Graph cannot be queried so cached results are kept.
+    """
+    token = acquire_graph_api_token()
     if not token:
-        return False
+        raise RuntimeError("Unable to acquire Graph API token")
     headers = {"Authorization": f"Bearer {token}"}
-    mail_nickname = email.replace("@", "_at_")
-    expected_upn = f"{mail_nickname}@oviedojeepclub.onmicrosoft.com"
-    filter_query = f"userPrincipalName eq '{expected_upn}'"
-    url = f"https://graph.microsoft.com/v1.0/users?$filter={quote(filter_query)}"
-    resp = requests.get(url, headers=headers)
-    if resp.status_code == 200:
-        data = resp.json()
-        return bool(data.get("value"))
-    return False
+    upns = {}
+    for email in emails:
+        mail_nickname = email.replace("@", "_at_")
+        upns[email] = f"{mail_nickname}@oviedojeepclub.onmicrosoft.com"
+    quoted = ",".join("'" + upn.replace("'", "''") + "'" for upn in upns.values())
+    filter_query = f"userPrincipalName in ({quoted})"
+    url = (
+        f"https://graph.microsoft.com/v1.0/users?$filter={quote(filter_query)}"
+        f"&$select=userPrincipalName"
+    )
+    resp = http_client.get(url, headers=headers)
+    if resp.status_code != 200:
+        raise RuntimeError(f"Graph user lookup failed: {resp.status_code} {resp.text}")
+    found = {u.get("userPrincipalName", "").lower() for u in resp.json().get("value", [])}
+    return {email: upn.lower() in found for email, upn in upns.items()}
+
+# Per-worker cache of account existence; Graph is only consulted in the background
+# (or synchronously once an entry is older than SESSION_VALIDITY_TTL)
+session_validity_cache = SessionValidityCache(
+    users_still_exist,
+    ttl=Config.SESSION_VALIDITY_TTL,
+    recheck_interval=Config.SESSION_RECHECK_INTERVAL
+)
+
+# Endpoints that serve assets and never need the account check
+_SESSION_CHECK_EXEMPT_ENDPOINTS = {'static', 'favicon', 'events.event_image'}
+
+def _session_key(email):
+    return (email or '').strip().lower()
 
 @auth_bp.before_app_request
 def validate_user_session():
+    if request.endpoint is None or request.endpoint in _SESSION_CHECK_EXEMPT_ENDPOINTS:
+        return
     if current_user.is_authenticated:
-        if not user_still_exists(current_user.email):
+        if not session_validity_cache.is_valid(_session_key(current_user.email)):
             logout_user()
             session.clear()
             flash("Your account is no longer valid. Please log in again.")
@@ -170,6 +190,8 @@ def auth_callback():
         ] if k in user_data
     }
     login_user(User(**user_for_login), remember=True)
+    # The account was just confirmed by B2C, so skip the first background lookup
+    session_validity_cache.mark(_session_key(user_data["email"]))
     return redirect(url_for('index'))
 
 @auth_bp.route('/logout')
@@ -189,17 +211,14 @@ def change_email():
     # Capture old email for notification
     old_email = session.get('user_data', {}).get('email')
     from user_services import update_b2c_user_email
-    from emails import send_email_change_notification_email
+    from emails import queue_email_change_notification_email
     try:
         # Update email in B2C
         update_b2c_user_email(current_user.id, new_email)
-        # Notify old address
-        import threading
-        threading.Thread(
-            target=send_email_change_notification_email,
-            args=(old_email, current_user.name, old_email, new_email),
-            daemon=True
-        ).start()
+        # Notify old address via the email outbox
+        queue_email_change_notification_email(
+            old_email, current_user.name, old_email, new_email
+        )
     except Exception as e:
         current_app.logger.exception("Failed to update email in B2C or send notification")
         return jsonify({'error': str(e)}), 500
@@ -1,4 +1,5 @@
 from azure.storage.blob import BlobServiceClient
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
 from azure.data.tables import TableServiceClient
 from azure.communication.email import EmailClient
 from square.client import Client as SquareClient
@@ -10,6 +11,15 @@ blob_service_client = BlobServiceClient.from_connection_string(
     Config.AZURE_STORAGE_CONNECTION_STRING
 )
 
+def async_blob_service_client():
+    """
+    Return a new async Blob service client for use inside an async view
+    (aio clients are bound to the event loop they were first used on).
+    """
+    return AsyncBlobServiceClient.from_connection_string(
+        Config.AZURE_STORAGE_CONNECTION_STRING
+    )
+
 # Initialize Azure Table service client and invitations table
 table_service_client = TableServiceClient.from_connection_string(
     Config.AZURE_STORAGE_CONNECTION_STRING
@@ -17,6 +27,15 @@ table_service_client = TableServiceClient.from_connection_string(
 invitations_table_client = table_service_client.create_table_if_not_exists(
     table_name="Invitations"
 )
+# Durable outbound email queue drained by email_outbox workers
+email_outbox_table_client = table_service_client.create_table_if_not_exists(
+    table_name="EmailOutbox"
+)
+
+# Encrypted integration credentials (e.g. the Facebook Page token)
+app_secrets_table_client = table_service_client.create_table_if_not_exists(
+    table_name="AppSecrets"
+)
 
 # Initialize Azure Communication Email client
 email_client = EmailClient.from_connection_string(
@@ -0,0 +1,49 @@
+"""
+Short-lived SAS URLs so browsers can upload and download event images directly
+from Blob Storage instead of passing the bytes through a gunicorn worker.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+
+from azure_services import blob_service_client
+
+def sas_available():
+    """
+    SAS tokens need the storage account key (not available with AAD/token credentials).
+    """
+    credential = blob_service_client.credential
+    return bool(getattr(credential, 'account_key', None))
+
+def _blob_sas_url(container, blob_name, permission, expiry):
+    credential = blob_service_client.credential
+    token = generate_blob_sas(
+        account_name=blob_service_client.account_name,
+        container_name=container,
+        blob_name=blob_name,
+        account_key=credential.account_key,
+        permission=permission,
+        expiry=expiry
+    )
+    blob_client = blob_service_client.get_blob_client(container=container, blob=blob_name)
+    return f"{blob_client.url}?{token}"
+
+def generate_upload_url(container, blob_name, ttl):
+    """
+    Write-only (create + write) URL valid for `ttl` seconds.
+    """
+    expiry = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+    return _blob_sas_url(
+        container, blob_name, BlobSasPermissions(create=True, write=True), expiry
+    )
+
+def generate_read_url(container, blob_name, ttl):
+    """
+    Read-only URL valid for at least `ttl` seconds.
+    The expiry is aligned to a `ttl`-sized window so repeated calls in the same window
+    return an identical URL and browsers can cache the image behind it.
+    """
+    now = datetime.now(timezone.utc).timestamp()
+    window_end = math.ceil(now / ttl) * ttl + ttl
+    expiry = datetime.fromtimestamp(window_end, tz=timezone.utc)
+    return _blob_sas_url(container, blob_name, BlobSasPermissions(read=True), expiry), int(window_end - now)
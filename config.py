@@ -1,4 +1,5 @@
 import os
+from urllib.parse import urlsplit
 
 def _env(key, required=True, default=None):
     """
@@ -21,6 +22,8 @@ class Config:
     CLIENT_SECRET = _env("AZURE_CLIENT_SECRET")
     TENANT_ID = _env("AZURE_TENANT_ID")
     REDIRECT_URI = _env("AZURE_REDIRECT_URI")
+    # Public base URL used to build links in emails rendered outside a request
+    APP_BASE_URL = os.getenv("APP_BASE_URL") or "{0.scheme}://{0.netloc}".format(urlsplit(REDIRECT_URI))
     AZURE_POLICY = _env("AZURE_POLICY")
     # B2C authority (includes policy)
     AZURE_AUTHORITY = _env("AZURE_AUTHORITY")
@@ -29,6 +32,30 @@ class Config:
     TOKEN_URL = f"{AUTHORITY}/oauth2/v2.0/token"
     # AAD authority for client credentials (e.g., Graph API)
     AAD_AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+    # Outbound HTTP (Graph, login, Facebook): default timeouts, retries and pool size
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+    # Per-dependency read timeouts (the connect timeout above applies to every host)
+    HTTP_READ_TIMEOUT_GRAPH = float(os.getenv("HTTP_READ_TIMEOUT_GRAPH", os.getenv("HTTP_READ_TIMEOUT", "20")))
+    HTTP_READ_TIMEOUT_LOGIN = float(os.getenv("HTTP_READ_TIMEOUT_LOGIN", "10"))
+    HTTP_READ_TIMEOUT_FACEBOOK = float(os.getenv("HTTP_READ_TIMEOUT_FACEBOOK", "15"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    HTTP_MAX_BACKOFF = float(os.getenv("HTTP_MAX_BACKOFF", "30"))
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+    # Seconds before expiry at which the cached Graph token is refreshed
+    GRAPH_TOKEN_REFRESH_MARGIN = int(os.getenv("GRAPH_TOKEN_REFRESH_MARGIN", "300"))
+    # Member directory snapshot (Graph delta sync): file location, staleness before a
+    # read triggers a sync, and minimum spacing between syncs
+    MEMBER_DIRECTORY_PATH = os.getenv("MEMBER_DIRECTORY_PATH") or None
+    MEMBER_DIRECTORY_MAX_AGE = int(os.getenv("MEMBER_DIRECTORY_MAX_AGE", "3600"))
+    MEMBER_DIRECTORY_MIN_SYNC_SECONDS = int(os.getenv("MEMBER_DIRECTORY_MIN_SYNC_SECONDS", "60"))
+    # Seconds the in-process membership number -> family members index is trusted
+    FAMILY_INDEX_TTL = int(os.getenv("FAMILY_INDEX_TTL", "60"))
+    # Upper bound (seconds) a deleted account can keep using an existing session
+    SESSION_VALIDITY_TTL = int(os.getenv("SESSION_VALIDITY_TTL", "300"))
+    # How often the background checker re-verifies active sessions against Graph
+    SESSION_RECHECK_INTERVAL = int(os.getenv("SESSION_RECHECK_INTERVAL", "60"))
 
     # Square
     SQUARE_ACCESS_TOKEN = _env("SQUARE_ACCESS_TOKEN")
@@ -36,16 +63,59 @@ class Config:
 
     # Azure Storage / Tables / Blob
     AZURE_STORAGE_CONNECTION_STRING = _env("AZURE_STORAGE_CONNECTION_STRING")
+    # Scheduled-job lock: "blob" (Azure Blob leases) or "file" (local runs)
+    JOB_LOCK_BACKEND = os.getenv("JOB_LOCK_BACKEND", "blob").lower()
+    JOB_LOCK_CONTAINER = os.getenv("JOB_LOCK_CONTAINER", "job-locks")
+    JOB_LOCK_LEASE_SECONDS = int(os.getenv("JOB_LOCK_LEASE_SECONDS", "60"))
+    # Minimum seconds between ETag revalidations of the cached event-store manifest
+    EVENTS_CACHE_REVALIDATE_SECONDS = int(os.getenv("EVENTS_CACHE_REVALIDATE_SECONDS", "30"))
+    # Default and maximum page sizes for /blob-events and /list_old_events
+    EVENTS_PAGE_SIZE = int(os.getenv("EVENTS_PAGE_SIZE", "20"))
+    EVENTS_MAX_PAGE_SIZE = int(os.getenv("EVENTS_MAX_PAGE_SIZE", "100"))
+    # Largest search radius accepted by /events/nearby
+    EVENTS_NEARBY_MAX_RADIUS_KM = float(os.getenv("EVENTS_NEARBY_MAX_RADIUS_KM", "500"))
+    # Encoded event list pages kept per worker
+    EVENTS_RESPONSE_CACHE_ENTRIES = int(os.getenv("EVENTS_RESPONSE_CACHE_ENTRIES", "256"))
+    # Event cover image proxy: browser cache lifetime and per-worker disk cache bounds
+    EVENT_IMAGE_MAX_AGE = int(os.getenv("EVENT_IMAGE_MAX_AGE", str(7 * 24 * 3600)))
+    EVENT_IMAGE_CACHE_DIR = os.getenv("EVENT_IMAGE_CACHE_DIR") or None
+    EVENT_IMAGE_CACHE_MAX_BYTES = int(os.getenv("EVENT_IMAGE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+    EVENT_IMAGE_CACHE_MAX_ITEM_BYTES = int(os.getenv("EVENT_IMAGE_CACHE_MAX_ITEM_BYTES", str(8 * 1024 * 1024)))
+    # Browser uploads/downloads cover images directly via SAS URLs; disable for private
+    # deployments to proxy every image through the app
+    EVENT_IMAGE_DIRECT_ACCESS = os.getenv("EVENT_IMAGE_DIRECT_ACCESS", "True").lower() in ("1", "true", "yes")
+    EVENT_IMAGE_SAS_UPLOAD_TTL = int(os.getenv("EVENT_IMAGE_SAS_UPLOAD_TTL", "600"))
+    EVENT_IMAGE_SAS_READ_TTL = int(os.getenv("EVENT_IMAGE_SAS_READ_TTL", "3600"))
+    # Seconds a cached image is served before its ETag is revalidated against the blob
+    EVENT_IMAGE_CACHE_TTL = int(os.getenv("EVENT_IMAGE_CACHE_TTL", "300"))
+    # Conditional-write retries when concurrent edits race on the event-store manifest
+    EVENTS_WRITE_MAX_RETRIES = int(os.getenv("EVENTS_WRITE_MAX_RETRIES", "5"))
 
     # Azure Communication Email
     AZURE_COMM_CONNECTION_STRING = _env("AZURE_COMM_CONNECTION_STRING")
     AZURE_COMM_CONNECTION_STRING_SENDER = _env("AZURE_COMM_CONNECTION_STRING_SENDER")
+    # Bulk sends (scheduled reminder jobs): concurrency, start rate and 429 retries
+    EMAIL_BULK_MAX_IN_FLIGHT = int(os.getenv("EMAIL_BULK_MAX_IN_FLIGHT", "8"))
+    EMAIL_BULK_RATE_PER_SECOND = float(os.getenv("EMAIL_BULK_RATE_PER_SECOND", "5"))
+    EMAIL_BULK_MAX_RETRIES = int(os.getenv("EMAIL_BULK_MAX_RETRIES", "3"))
+    # Email outbox worker: poll interval, batch size, send threads, retries before dead-lettering
+    OUTBOX_POLL_SECONDS = int(os.getenv("OUTBOX_POLL_SECONDS", "15"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+    OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    # Seconds a claimed message is reserved before another worker may retry it
+    OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+    # Hours sent-email tombstones (idempotency) and dead letters are kept before purging
+    OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", "168"))
 
     # Facebook Graph API
     FACEBOOK_PAGE_ID = _env("FACEBOOK_PAGE_ID")
     FACEBOOK_REDIRECT_URI = _env("FACEBOOK_REDIRECT_URI")
     FACEBOOK_APP_ID = _env("FACEBOOK_APP_ID")
     FACEBOOK_APP_SECRET = _env("FACEBOOK_APP_SECRET")
+    # Key for encrypting the stored Page token (Fernet); derived from FLASK_SECRET_KEY if unset
+    FACEBOOK_TOKEN_KEY = os.getenv("FACEBOOK_TOKEN_KEY")
+    FACEBOOK_SYNC_MINUTES = int(os.getenv("FACEBOOK_SYNC_MINUTES", "30"))
 
     # JSON schema settings (if any future)
     # Add more config as needed
\ No newline at end of file
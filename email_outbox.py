@@ -0,0 +1,226 @@
+"""
+Email outbox: request handlers enqueue rendered emails as durable records in the
+EmailOutbox Azure Table and return immediately; a background worker in each process
+claims pending records, sends them through Azure Communication Services, retries
+failures with back-off and dead-letters messages that keep failing.
+
+Only live work (pending or being sent) stays in the outbox partition, so each poll
+reads just that. A sent message is replaced by a small tombstone in the sent partition,
+which keeps idempotency keys from being re-sent; tombstones and dead letters are purged
+once they are older than OUTBOX_RETENTION_HOURS.
+"""
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+)
+from azure.data.tables import UpdateMode
+
+from azure_services import email_outbox_table_client
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PARTITION = "outbox"
+SENT_PARTITION = "sent"
+DEAD_PARTITION = "dead"
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_DEAD = "dead"
+
+_worker_lock = threading.Lock()
+_worker_state = {"pid": None, "thread": None, "wake": threading.Event()}
+# Seconds between purges of expired tombstones and dead letters
+PURGE_INTERVAL = 3600
+
+def enqueue_email(subject, html_content, recipient_email, recipient_name, idempotency_key=None):
+    """
+    Store an email for background delivery and return its outbox id.
+    Enqueuing the same `idempotency_key` twice keeps the first record only, also once
+    it has been sent (until its tombstone is purged).
+    """
+    key = idempotency_key or uuid.uuid4().hex
+    if idempotency_key and _already_sent(key):
+        logger.info(f"Email {key} already sent; skipping duplicate")
+        return key
+    entity = {
+        "PartitionKey": OUTBOX_PARTITION,
+        "RowKey": key,
+        "Subject": subject,
+        "Html": html_content,
+        "RecipientEmail": recipient_email,
+        "RecipientName": recipient_name or "",
+        "Status": STATUS_PENDING,
+        "Attempts": 0,
+        "NextAttemptAt": time.time(),
+        "LeaseUntil": 0.0,
+        "LastError": "",
+    }
+    try:
+        email_outbox_table_client.create_entity(entity=entity)
+        logger.info(f"Queued email {key} to {recipient_email}")
+    except ResourceExistsError:
+        logger.info(f"Email {key} already queued; skipping duplicate")
+    start_outbox_worker()
+    _worker_state["wake"].set()
+    return key
+
+def _already_sent(key):
+    try:
+        email_outbox_table_client.get_entity(SENT_PARTITION, key)
+        return True
+    except ResourceNotFoundError:
+        return False
+
+def _remove(key):
+    try:
+        email_outbox_table_client.delete_entity(OUTBOX_PARTITION, key)
+    except ResourceNotFoundError:
+        pass
+
+def _claim(entity):
+    """
+    Mark a record as being sent by this worker; False if another worker got there first.
+    """
+    entity["Status"] = STATUS_SENDING
+    entity["LeaseUntil"] = time.time() + Config.OUTBOX_LEASE_SECONDS
+    try:
+        email_outbox_table_client.update_entity(
+            entity=entity, mode=UpdateMode.MERGE,
+            etag=entity.metadata["etag"], match_condition=MatchConditions.IfNotModified
+        )
+        return True
+    except ResourceModifiedError:
+        return False
+
+def _deliver(entity):
+    from emails import _send_email
+    key = entity["RowKey"]
+    # A previous attempt may have sent it and written the tombstone, then failed to delete
+    if _already_sent(key):
+        _remove(key)
+        return
+    try:
+        _send_email(
+            entity["Subject"], entity["Html"],
+            entity["RecipientEmail"], entity["RecipientName"]
+        )
+    except Exception as e:
+        attempts = int(entity.get("Attempts", 0)) + 1
+        if attempts >= Config.OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Email {key} dead-lettered after {attempts} attempts: {e}")
+            dead = {k: v for k, v in entity.items() if k != "PartitionKey"}
+            dead.update({
+                "PartitionKey": DEAD_PARTITION,
+                "Status": STATUS_DEAD,
+                "Attempts": attempts,
+                "LastError": str(e)[:1000],
+                "DeadAt": time.time(),
+            })
+            email_outbox_table_client.upsert_entity(entity=dead, mode=UpdateMode.REPLACE)
+            _remove(key)
+            return
+        email_outbox_table_client.update_entity(entity={
+            "PartitionKey": OUTBOX_PARTITION,
+            "RowKey": key,
+            "Status": STATUS_PENDING,
+            "Attempts": attempts,
+            "NextAttemptAt": time.time() + min(30 * (2 ** attempts), 3600),
+            "LastError": str(e)[:1000],
+        }, mode=UpdateMode.MERGE)
+        return
+    # Tombstone first, so a failed delete is cleaned up (not re-sent) on the next claim
+    email_outbox_table_client.upsert_entity(entity={
+        "PartitionKey": SENT_PARTITION,
+        "RowKey": key,
+        "SentAt": time.time(),
+    }, mode=UpdateMode.REPLACE)
+    _remove(key)
+
+def drain_outbox(pool=None):
+    """
+    Send every due record once. Returns the number of records claimed.
+    """
+    now = time.time()
+    due = email_outbox_table_client.query_entities(
+        "PartitionKey eq @pk and ((Status eq @pending and NextAttemptAt le @now) "
+        "or (Status eq @sending and LeaseUntil le @now))",
+        parameters={"pk": OUTBOX_PARTITION, "pending": STATUS_PENDING,
+                    "sending": STATUS_SENDING, "now": now},
+        results_per_page=Config.OUTBOX_BATCH_SIZE
+    )
+    claimed = []
+    for entity in due:
+        if _claim(entity):
+            claimed.append(entity)
+        if len(claimed) >= Config.OUTBOX_BATCH_SIZE:
+            break
+    if pool is not None:
+        list(pool.map(_deliver, claimed))
+    else:
+        for entity in claimed:
+            _deliver(entity)
+    return len(claimed)
+
+def purge_outbox():
+    """
+    Delete sent tombstones and dead letters older than the retention period.
+    Returns the number of records deleted.
+    """
+    cutoff = time.time() - Config.OUTBOX_RETENTION_HOURS * 3600
+    deleted = 0
+    for partition, field in ((SENT_PARTITION, "SentAt"), (DEAD_PARTITION, "DeadAt")):
+        expired = email_outbox_table_client.query_entities(
+            f"PartitionKey eq @pk and {field} le @cutoff",
+            parameters={"pk": partition, "cutoff": cutoff},
+            select=["PartitionKey", "RowKey"]
+        )
+        for entity in expired:
+            try:
+                email_outbox_table_client.delete_entity(partition, entity["RowKey"])
+                deleted += 1
+            except ResourceNotFoundError:
+                pass
+    return deleted
+
+def _run():
+    wake = _worker_state["wake"]
+    next_purge = 0.0
+    with ThreadPoolExecutor(max_workers=Config.OUTBOX_WORKERS, thread_name_prefix='outbox') as pool:
+        while True:
+            try:
+                # Keep draining while full batches come back
+                while drain_outbox(pool) >= Config.OUTBOX_BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception("Email outbox drain failed")
+            if time.time() >= next_purge:
+                next_purge = time.time() + PURGE_INTERVAL
+                try:
+                    purged = purge_outbox()
+                    if purged:
+                        logger.info(f"Purged {purged} expired email outbox records")
+                except Exception:
+                    logger.exception("Email outbox purge failed")
+            wake.wait(Config.OUTBOX_POLL_SECONDS)
+            wake.clear()
+
+def start_outbox_worker():
+    """
+    Start the background outbox worker for this process (idempotent, fork-aware).
+    """
+    state = _worker_state
+    if state["pid"] == os.getpid() and state["thread"] is not None and state["thread"].is_alive():
+        return
+    with _worker_lock:
+        if state["pid"] == os.getpid() and state["thread"] is not None and state["thread"].is_alive():
+            return
+        state["pid"] = os.getpid()
+        state["wake"] = threading.Event()
+        state["thread"] = threading.Thread(target=_run, name='email-outbox', daemon=True)
+        state["thread"].start()
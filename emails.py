@@ -1,8 +1,14 @@
 import os
+import time
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import render_template, url_for
+from contextlib import contextmanager
+from flask import current_app, has_request_context, url_for
+from azure.core.exceptions import HttpResponseError
 from azure_services import email_client
+from email_outbox import enqueue_email
 from config import Config
 import logging
 
@@ -19,19 +25,83 @@ def _get_logo_b64():
             _logo_b64 = base64.b64encode(f.read()).decode('utf-8')
     return _logo_b64
 
-def _send_email(subject, html_content, recipient_email, recipient_name):
-    logger.debug(f"_send_email called with subject='{subject}', recipient_email='{recipient_email}', recipient_name='{recipient_name}'")
-    message = {
-        "senderAddress": Config.AZURE_COMM_CONNECTION_STRING_SENDER,
-        "content": {"subject": subject, "html": html_content},
-        "recipients": {"to": [{"address": recipient_email, "displayName": recipient_name}]},
-        "attachments": [{
+# Invariant attachment block shared by every outgoing message
+_attachments = None
+
+def _get_attachments():
+    global _attachments
+    if _attachments is None:
+        _attachments = [{
             "name": "ojc.png",
             "contentType": "image/png",
             "contentInBase64": _get_logo_b64(),
             "contentId": "ojc_logo"
         }]
+    return _attachments
+
+def _build_message(subject, html_content, recipient_email, recipient_name):
+    return {
+        "senderAddress": Config.AZURE_COMM_CONNECTION_STRING_SENDER,
+        "content": {"subject": subject, "html": html_content},
+        "recipients": {"to": [{"address": recipient_email, "displayName": recipient_name}]},
+        "attachments": _get_attachments()
     }
+
+# Compiled email templates, loaded once per process
+_templates = {}
+
+def _get_template(template_name):
+    template = _templates.get(template_name)
+    if template is None:
+        template = current_app.jinja_env.get_template(template_name)
+        _templates[template_name] = template
+    return template
+
+@contextmanager
+def email_render_context():
+    """
+    Provide a request context for url_for(_external=True) when rendering outside a
+    request (scheduled jobs). Needs an app context and uses Config.APP_BASE_URL.
+    """
+    if has_request_context():
+        yield
+        return
+    with current_app.test_request_context('/', base_url=Config.APP_BASE_URL):
+        yield
+
+def _render(template_name, **context):
+    """
+    Render an email template directly, skipping the request-bound context processors.
+    """
+    context.setdefault('current_year', datetime.now().year)
+    return _get_template(template_name).render(context)
+
+def render_batch(template_name, subject_pattern, recipients, **common):
+    """
+    Render one template for many recipients.
+    `recipients` is an iterable of dicts holding 'recipient_email', 'recipient_name' and
+    any per-recipient context; `common` is shared by all of them. `subject_pattern` is
+    a str.format pattern over the same context.
+    Returns a list of (subject, html_content, recipient_email, recipient_name) tuples
+    ready for send_bulk_emails.
+    """
+    template = _get_template(template_name)
+    base = dict(common)
+    base.setdefault('current_year', datetime.now().year)
+    messages = []
+    for recipient in recipients:
+        context = dict(base, **recipient)
+        messages.append((
+            subject_pattern.format(**context),
+            template.render(context),
+            recipient['recipient_email'],
+            recipient['recipient_name']
+        ))
+    return messages
+
+def _send_email(subject, html_content, recipient_email, recipient_name):
+    logger.debug(f"_send_email called with subject='{subject}', recipient_email='{recipient_email}', recipient_name='{recipient_name}'")
+    message = _build_message(subject, html_content, recipient_email, recipient_name)
     logger.debug("Invoking email_client.begin_send...")
     try:
         poller = email_client.begin_send(message)
@@ -43,69 +113,207 @@ def _send_email(subject, html_content, recipient_email, recipient_name):
         logger.exception(f"Error occurred while sending email to {recipient_email}")
         raise
 
-def send_disablement_reminder_email(recipient_email, recipient_name, days_left):
-    login_url = url_for('auth.login', _external=True)
-    html_content = render_template(
+class _RateLimiter:
+    """
+    Token bucket shared by the bulk send workers.
+    """
+    def __init__(self, rate_per_second):
+        self.rate = float(rate_per_second)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _retry_after_seconds(error, attempt):
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(float(headers.get('Retry-After')), 0.5)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
+
+def _send_with_backoff(message, limiter, max_retries):
+    recipient = message["recipients"]["to"][0]["address"]
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            result = email_client.begin_send(message).result()
+            return {'recipient': recipient, 'status': 'sent', 'result': result}
+        except HttpResponseError as e:
+            if e.status_code == 429 and attempt < max_retries:
+                delay = _retry_after_seconds(e, attempt)
+                logger.warning(f"Email throttled for {recipient}; retrying in {delay}s")
+                time.sleep(delay)
+                continue
+            logger.exception(f"Error occurred while sending email to {recipient}")
+            return {'recipient': recipient, 'status': 'failed', 'error': str(e)}
+        except Exception as e:
+            logger.exception(f"Error occurred while sending email to {recipient}")
+            return {'recipient': recipient, 'status': 'failed', 'error': str(e)}
+
+def send_bulk_emails(messages, max_in_flight=None, rate_per_second=None, max_retries=None):
+    """
+    Send many emails concurrently.
+    `messages` is an iterable of (subject, html_content, recipient_email, recipient_name).
+    At most `max_in_flight` sends are outstanding and no more than `rate_per_second`
+    are started per second; 429 responses are retried after Retry-After.
+    Returns a list of per-recipient result dicts in input order.
+    """
+    max_in_flight = max_in_flight or Config.EMAIL_BULK_MAX_IN_FLIGHT
+    rate_per_second = rate_per_second or Config.EMAIL_BULK_RATE_PER_SECOND
+    max_retries = Config.EMAIL_BULK_MAX_RETRIES if max_retries is None else max_retries
+    built = [_build_message(*m) for m in messages]
+    if not built:
+        return []
+    limiter = _RateLimiter(rate_per_second)
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='email') as pool:
+        results = list(pool.map(lambda m: _send_with_backoff(m, limiter, max_retries), built))
+    sent = sum(1 for r in results if r['status'] == 'sent')
+    logger.info(f"Bulk email run finished: {sent} sent, {len(results) - sent} failed")
+    return results
+
+def render_disablement_reminder_email(recipient_name, days_left):
+    """
+    Return (subject, html_content) for a membership expiration reminder.
+    """
+    with email_render_context():
+        login_url = url_for('auth.login', _external=True)
+    html_content = _render(
         'emails/disablement_reminder.html',
         recipient_name=recipient_name,
         login_url=login_url,
-        days_left=days_left,
-        current_year=datetime.now().year
+        days_left=days_left
     )
     subject = f"Membership Expiration Reminder - {days_left} Days Left"
+    return subject, html_content
+
+def render_disablement_reminder_emails(recipients):
+    """
+    Batch-render expiration reminders; `recipients` holds (email, name, days_left) tuples.
+    """
+    with email_render_context():
+        login_url = url_for('auth.login', _external=True)
+    return render_batch(
+        'emails/disablement_reminder.html',
+        "Membership Expiration Reminder - {days_left} Days Left",
+        ({'recipient_email': e, 'recipient_name': n, 'days_left': d} for e, n, d in recipients),
+        login_url=login_url
+    )
+
+def send_disablement_reminder_email(recipient_email, recipient_name, days_left):
+    subject, html_content = render_disablement_reminder_email(recipient_name, days_left)
     return _send_email(subject, html_content, recipient_email, recipient_name)
 
-def send_event_reminder_email(recipient_email, recipient_name, event, days_left):
-    html_content = render_template(
+def render_event_reminder_email(recipient_name, event, days_left):
+    """
+    Return (subject, html_content) for an event reminder.
+    """
+    html_content = _render(
         'emails/event_reminder.html',
         recipient_name=recipient_name,
         event_name=event.get('name'),
         event_start_time=event.get('start_time'),
-        days_left=days_left,
-        current_year=datetime.now().year
+        days_left=days_left
     )
     subject = f"Event Reminder: {event.get('name')} starts in {days_left} day{'s' if days_left>1 else ''}"
+    return subject, html_content
+
+def render_event_reminder_emails(event, days_left, recipients):
+    """
+    Batch-render reminders for one event; `recipients` holds (email, name) tuples.
+    """
+    plural = 's' if days_left > 1 else ''
+    return render_batch(
+        'emails/event_reminder.html',
+        f"Event Reminder: {{event_name}} starts in {{days_left}} day{plural}",
+        ({'recipient_email': e, 'recipient_name': n} for e, n in recipients),
+        event_name=event.get('name'),
+        event_start_time=event.get('start_time'),
+        days_left=days_left
+    )
+
+def send_event_reminder_email(recipient_email, recipient_name, event, days_left):
+    subject, html_content = render_event_reminder_email(recipient_name, event, days_left)
     return _send_email(subject, html_content, recipient_email, recipient_name)
 
-def send_family_invitation_email(recipient_email, recipient_name, invitation_link):
-    logger.debug(f"send_family_invitation_email called with recipient_email={recipient_email}, recipient_name={recipient_name}, invitation_link={invitation_link}")
-    html_content = render_template(
+def render_family_invitation_email(recipient_name, invitation_link):
+    html_content = _render(
         'emails/family_invitation.html',
         recipient_name=recipient_name,
-        invitation_link=invitation_link,
-        current_year=datetime.now().year
+        invitation_link=invitation_link
     )
     subject = "You're Invited to Join the Oviedo Jeep Club Family Membership"
+    return subject, html_content
+
+def send_family_invitation_email(recipient_email, recipient_name, invitation_link):
+    logger.debug(f"send_family_invitation_email called with recipient_email={recipient_email}, recipient_name={recipient_name}, invitation_link={invitation_link}")
+    subject, html_content = render_family_invitation_email(recipient_name, invitation_link)
     return _send_email(subject, html_content, recipient_email, recipient_name)
 
-def send_membership_renewal_email(recipient_email, recipient_name):
-    html_content = render_template(
+def queue_family_invitation_email(recipient_email, recipient_name, invitation_link, idempotency_key=None):
+    subject, html_content = render_family_invitation_email(recipient_name, invitation_link)
+    return enqueue_email(subject, html_content, recipient_email, recipient_name, idempotency_key)
+
+def render_membership_renewal_email(recipient_name):
+    html_content = _render(
         'emails/membership_renewal.html',
-        recipient_name=recipient_name,
-        current_year=datetime.now().year
+        recipient_name=recipient_name
     )
     subject = "Membership Renewal Confirmation"
+    return subject, html_content
+
+def send_membership_renewal_email(recipient_email, recipient_name):
+    subject, html_content = render_membership_renewal_email(recipient_name)
     return _send_email(subject, html_content, recipient_email, recipient_name)
 
-def send_new_membership_email(recipient_email, recipient_name, receipt_url):
-    html_content = render_template(
+def queue_membership_renewal_email(recipient_email, recipient_name, idempotency_key=None):
+    subject, html_content = render_membership_renewal_email(recipient_name)
+    return enqueue_email(subject, html_content, recipient_email, recipient_name, idempotency_key)
+
+def render_new_membership_email(recipient_name, receipt_url):
+    html_content = _render(
         'emails/new_membership.html',
         recipient_name=recipient_name,
-        receipt_url=receipt_url,
-        current_year=datetime.now().year
+        receipt_url=receipt_url
     )
     subject = "Welcome to The Oviedo Jeep Club!"
+    return subject, html_content
+
+def send_new_membership_email(recipient_email, recipient_name, receipt_url):
+    subject, html_content = render_new_membership_email(recipient_name, receipt_url)
     return _send_email(subject, html_content, recipient_email, recipient_name)
-  
-def send_email_change_notification_email(recipient_email, recipient_name, old_email, new_email):
-    """Send a notification to the old email that the user has changed their address."""
-    logger.debug(f"send_email_change_notification_email called for {recipient_email}, old_email={old_email}, new_email={new_email}")
-    html_content = render_template(
+
+def queue_new_membership_email(recipient_email, recipient_name, receipt_url, idempotency_key=None):
+    subject, html_content = render_new_membership_email(recipient_name, receipt_url)
+    return enqueue_email(subject, html_content, recipient_email, recipient_name, idempotency_key)
+
+def render_email_change_notification_email(recipient_name, old_email, new_email):
+    html_content = _render(
         'emails/email_change_notification.html',
         recipient_name=recipient_name,
         old_email=old_email,
-        new_email=new_email,
-        current_year=datetime.now().year
+        new_email=new_email
     )
     subject = "Your Oviedo Jeep Club email address has changed"
-    return _send_email(subject, html_content, recipient_email, recipient_name)
\ No newline at end of file
+    return subject, html_content
+
+def send_email_change_notification_email(recipient_email, recipient_name, old_email, new_email):
+    """Send a notification to the old email that the user has changed their address."""
+    logger.debug(f"send_email_change_notification_email called for {recipient_email}, old_email={old_email}, new_email={new_email}")
+    subject, html_content = render_email_change_notification_email(recipient_name, old_email, new_email)
+    return _send_email(subject, html_content, recipient_email, recipient_name)
+
+def queue_email_change_notification_email(recipient_email, recipient_name, old_email, new_email,
+                                          idempotency_key=None):
+    subject, html_content = render_email_change_notification_email(recipient_name, old_email, new_email)
+    return enqueue_email(subject, html_content, recipient_email, recipient_name, idempotency_key)
@@ -0,0 +1,130 @@
+"""
+Spatial index over event place.location coordinates: events are bucketed into a fixed
+lat/lon grid, so a radius query only visits nearby cells, and distances for the
+candidates are computed with a vectorized haversine over NumPy arrays.
+"""
+import math
+import threading
+import numpy as np
+
+from event_utils import to_epoch, parse_date
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+# Grid cell size in degrees (about 55 km north-south)
+CELL_DEGREES = 0.5
+
+def _coordinates(event):
+    location = (event.get('place') or {}).get('location') or {}
+    try:
+        lat, lon = float(location['latitude']), float(location['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    # create_event stores 0/0 when no coordinates were entered
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        return None
+    return lat, lon
+
+def _start(event):
+    try:
+        return to_epoch(parse_date(event['start_time']))
+    except (KeyError, TypeError, ValueError):
+        return np.nan
+
+class GeoIndex:
+    def __init__(self, events, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.columns = int(math.ceil(360.0 / cell_degrees))
+        self.events, coords, starts = [], [], []
+        for event in events:
+            point = _coordinates(event)
+            if point is not None:
+                self.events.append(event)
+                coords.append(point)
+                starts.append(_start(event))
+        coords = np.array(coords, dtype=np.float64).reshape(-1, 2)
+        self.lat = np.radians(coords[:, 0])
+        self.lon = np.radians(coords[:, 1])
+        self.starts = np.array(starts, dtype=np.float64)
+        rows, cols = self._cell(coords[:, 0], coords[:, 1])
+        # (row, column) grid cell -> positions of the events inside it
+        cell_ids = rows * self.columns + cols
+        order = np.argsort(cell_ids, kind="stable")
+        unique_ids, starts_at = np.unique(cell_ids[order], return_index=True)
+        self.cells = {
+            divmod(int(cell_id), self.columns): chunk
+            for cell_id, chunk in zip(unique_ids, np.split(order, starts_at[1:]))
+        }
+
+    def __len__(self):
+        return len(self.events)
+
+    def _cell(self, lat, lon):
+        rows = np.floor((np.asarray(lat) + 90.0) / self.cell_degrees).astype(np.int64)
+        cols = np.floor((np.asarray(lon) + 180.0) / self.cell_degrees).astype(np.int64) % self.columns
+        return rows, cols
+
+    def _candidates(self, lat, lon, radius_km):
+        dlat = radius_km / KM_PER_DEGREE
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        row_lo, row_hi = (int(r) for r in self._cell([lat_lo, lat_hi], [0, 0])[0])
+        # Longitude span widens with latitude; near the poles every column qualifies
+        widest = max(abs(lat_lo), abs(lat_hi))
+        if widest >= 89.9:
+            cols = range(self.columns)
+        else:
+            dlon = dlat / math.cos(math.radians(widest))
+            if dlon >= 180:
+                cols = range(self.columns)
+            else:
+                first = int(math.floor((lon - dlon + 180.0) / self.cell_degrees))
+                last = int(math.floor((lon + dlon + 180.0) / self.cell_degrees))
+                cols = sorted({c % self.columns for c in range(first, last + 1)})
+        chunks = [
+            self.cells[(row, col)] for row in range(row_lo, row_hi + 1) for col in cols
+            if (row, col) in self.cells
+        ]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def distances(self, lat, lon, positions):
+        """
+        Great-circle distances in km from (lat, lon) to the events at `positions`.
+        """
+        phi = math.radians(lat)
+        dphi = self.lat[positions] - phi
+        dlam = self.lon[positions] - math.radians(lon)
+        a = np.sin(dphi / 2) ** 2 + math.cos(phi) * np.cos(self.lat[positions]) * np.sin(dlam / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def nearby(self, lat, lon, radius_km, after=None, limit=None):
+        """
+        Events within `radius_km` of (lat, lon), nearest first, as (event, distance_km)
+        pairs. `after` keeps only events starting after that epoch time.
+        """
+        positions = self._candidates(lat, lon, radius_km)
+        if after is not None and len(positions):
+            positions = positions[self.starts[positions] > after]
+        if not len(positions):
+            return []
+        dist = self.distances(lat, lon, positions)
+        within = dist <= radius_km
+        positions, dist = positions[within], dist[within]
+        order = np.argsort(dist, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [(self.events[positions[i]], float(dist[i])) for i in order]
+
+_geo_state = {}
+_geo_lock = threading.Lock()
+
+def get_geo_index(event_index, scope):
+    """
+    Return the GeoIndex for the EventIndex of a scope, rebuilding it only when that
+    EventIndex changed (new event-store version or month).
+    """
+    with _geo_lock:
+        source, geo = _geo_state.get(scope, (None, None))
+        if source is not event_index:
+            geo = GeoIndex(event_index.events)
+            _geo_state[scope] = (event_index, geo)
+        return geo
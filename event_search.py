@@ -0,0 +1,254 @@
+"""
+Full-text event search: an in-memory inverted index over event name, description and
+place name, ranked with BM25. The index is kept per event-store partition, so when the
+store version changes only partitions that were added or retired are re-indexed.
+"""
+import re
+import math
+import heapq
+import bisect
+import threading
+from collections import Counter
+
+from event_utils import get_event_partitions, get_event_partitions_async
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are at be by for from in is it of on or the to was we were when where with".split()
+)
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Extra weight for terms in the event name
+NAME_WEIGHT = 2
+# Most vocabulary terms a type-ahead prefix expands to
+MAX_PREFIX_TERMS = 50
+
+# Words the suffix rules would mangle ("news" is not the plural of "new")
+STEM_EXCEPTIONS = frozenset(
+    "always bias canvas christmas during evening lens morning news series species texas".split()
+)
+VOWELS = "aeiou"
+
+def _is_consonant(word, i):
+    if word[i] in VOWELS:
+        return False
+    # y after a consonant acts as a vowel ("party")
+    return word[i] != "y" or i == 0 or not _is_consonant(word, i - 1)
+
+def _measure(word):
+    # Porter's m: the number of vowel-consonant sequences in `word`
+    m, previous_vowel = 0, False
+    for i in range(len(word)):
+        consonant = _is_consonant(word, i)
+        if consonant and previous_vowel:
+            m += 1
+        previous_vowel = not consonant
+    return m
+
+def _has_vowel(word):
+    return any(not _is_consonant(word, i) for i in range(len(word)))
+
+def _ends_cvc(word):
+    # consonant-vowel-consonant, the last not w/x/y: a short syllable as in "rac(e)"
+    n = len(word)
+    return (n >= 3 and _is_consonant(word, n - 3) and not _is_consonant(word, n - 2)
+            and _is_consonant(word, n - 1) and word[-1] not in "wxy")
+
+def stem(word):
+    """
+    Light Porter-style stemmer: plurals, -ed/-ing and a final e, each applied only
+    when enough of the word is left (Porter's measure), so that "runs", "running" and
+    "run" (or "race", "races", "raced") share a term while "tree" and "news" are kept.
+    """
+    if len(word) <= 3 or word.isdigit() or word in STEM_EXCEPTIONS:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith(("sses", "shes", "ches", "xes", "zes")):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")) and _has_vowel(word[:-2]):
+        word = word[:-1]
+    if word.endswith("eed"):
+        # agreed -> agree, but not feed/need
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ("ing", "ed"):
+            base = word[:-len(suffix)]
+            if word.endswith(suffix) and len(base) >= 3 and _has_vowel(base):
+                word = base
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                # running -> runn -> run
+                elif len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                    word = word[:-1]
+                # raced -> rac -> race
+                elif _measure(word) == 1 and _ends_cvc(word):
+                    word += "e"
+                break
+    if word.endswith("e") and len(word) > 4 and word[-2] not in VOWELS:
+        base = word[:-1]
+        m = _measure(base)
+        if m > 1 or (m == 1 and not _ends_cvc(base)):
+            word = base
+    return word
+
+def words(text):
+    """
+    Lowercased words of `text` with stopwords removed.
+    """
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+def _document_words(event):
+    place = event.get("place") or {}
+    return (words(event.get("name")) * NAME_WEIGHT + words(event.get("description")) +
+            words(place.get("name")))
+
+class SearchIndex:
+    def __init__(self):
+        self.version = None
+        self.postings = {}       # term -> {event id: term frequency}
+        self.vocabulary = []     # sorted unstemmed words, for prefix lookups
+        self.word_counts = {}    # unstemmed word -> number of events containing it
+        self.doc_lengths = {}    # event id -> number of terms
+        self.events = {}         # event id -> event
+        self.partitions = {}     # partition blob name -> event ids indexed from it
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        event_id = event.get("id")
+        if not event_id:
+            return
+        if event_id in self.events:
+            self.remove(event_id)
+        surface = _document_words(event)
+        terms = Counter(stem(w) for w in surface)
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[event_id] = count
+        for word in set(surface):
+            if word not in self.word_counts:
+                self.word_counts[word] = 0
+                bisect.insort(self.vocabulary, word)
+            self.word_counts[word] += 1
+        length = sum(terms.values())
+        self.doc_lengths[event_id] = length
+        self.total_length += length
+        self.events[event_id] = event
+
+    def remove(self, event_id):
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return
+        surface = set(_document_words(event))
+        for term in {stem(w) for w in surface}:
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(event_id, None)
+            if not docs:
+                del self.postings[term]
+        for word in surface:
+            self.word_counts[word] -= 1
+            if not self.word_counts[word]:
+                del self.word_counts[word]
+                i = bisect.bisect_left(self.vocabulary, word)
+                if i < len(self.vocabulary) and self.vocabulary[i] == word:
+                    del self.vocabulary[i]
+        self.total_length -= self.doc_lengths.pop(event_id, 0)
+
+    def sync(self, version, partitions):
+        """
+        Bring the index up to `version`: drop events from partitions that are gone and
+        index the partitions that are new. Unchanged partitions are not touched.
+        """
+        if version == self.version:
+            return
+        removed = [name for name in self.partitions if name not in partitions]
+        for name in removed:
+            for event_id in self.partitions.pop(name):
+                self.remove(event_id)
+        for name, events in partitions.items():
+            if name not in self.partitions:
+                for event in events:
+                    self.add(event)
+                self.partitions[name] = [e.get("id") for e in events if e.get("id")]
+        self.version = version
+
+    def _expand(self, prefix):
+        # Stems of the indexed words that start with the typed (unstemmed) prefix
+        i = bisect.bisect_left(self.vocabulary, prefix)
+        terms = set()
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            terms.add(stem(self.vocabulary[i]))
+            if len(terms) == MAX_PREFIX_TERMS:
+                break
+            i += 1
+        return terms
+
+    def _term_scores(self, term, avgdl):
+        docs = self.postings.get(term, {})
+        n = len(self.events)
+        idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+        scores = {}
+        for event_id, tf in docs.items():
+            norm = K1 * (1 - B + B * self.doc_lengths[event_id] / avgdl)
+            scores[event_id] = idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, limit=20, prefix=True):
+        """
+        Return up to `limit` (event, score) pairs ranked by BM25, ties newest first.
+        With `prefix` set, the last query word also matches longer terms (type-ahead).
+        """
+        if not self.events:
+            return []
+        words = TOKEN_RE.findall((query or "").lower())
+        if not words:
+            return []
+        avgdl = self.total_length / len(self.events) or 1.0
+        totals = Counter()
+        for position, word in enumerate(words):
+            if word in STOPWORDS:
+                continue
+            term = stem(word)
+            if prefix and position == len(words) - 1:
+                # Best-scoring expansion per event, so a short prefix is not over-weighted
+                best = {}
+                for candidate in self._expand(word) | {term}:
+                    for event_id, score in self._term_scores(candidate, avgdl).items():
+                        if score > best.get(event_id, 0.0):
+                            best[event_id] = score
+                totals.update(best)
+            else:
+                totals.update(self._term_scores(term, avgdl))
+        ranked = heapq.nlargest(
+            limit, totals.items(),
+            key=lambda item: (item[1], self.events[item[0]].get("start_time") or "")
+        )
+        return [(self.events[event_id], score) for event_id, score in ranked]
+
+_search_index = SearchIndex()
+_search_lock = threading.Lock()
+
+def _search(version, partitions, query, limit, prefix):
+    with _search_lock:
+        _search_index.sync(version, partitions)
+        return _search_index.search(query, limit, prefix)
+
+def search_events(query, limit=20, prefix=True):
+    """
+    Search the event store, first syncing the per-worker index to the current version.
+    """
+    version, partitions = get_event_partitions()
+    return _search(version, partitions, query, limit, prefix)
+
+async def search_events_async(query, limit=20, prefix=True):
+    """
+    Async variant of search_events; the event store is read with the aio Blob client.
+    """
+    version, partitions = await get_event_partitions_async()
+    return _search(version, partitions, query, limit, prefix)
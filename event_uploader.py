@@ -1,12 +1,18 @@
 # ===== Imports =====
 import os
+import csv
 import json
-from jsonschema import validate, ValidationError, SchemaError
+import uuid
+import argparse
+from functools import lru_cache
+from jsonschema import Draft202012Validator, SchemaError
 from azure.storage.blob import BlobServiceClient
 
 # ===== Global Constants and Configuration =====
 AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = "events"
+# Characters read from a JSON array file per chunk while streaming
+STREAM_CHUNK_SIZE = 64 * 1024
 
 EVENT_SCHEMA = {
     "$schema": "https://json-schema.org/draft/2020-12/schema",
@@ -58,19 +64,39 @@ EVENT_SCHEMA = {
 }
 
 # ===== Helper Functions =====
+@lru_cache(maxsize=None)
+def get_validator(item=False):
+    """
+    Return the compiled Draft 2020-12 validator for EVENT_SCHEMA (or for a single
+    event when `item` is set). The schema is checked and compiled once per process.
+    """
+    schema = EVENT_SCHEMA["items"] if item else EVENT_SCHEMA
+    Draft202012Validator.check_schema(EVENT_SCHEMA)
+    return Draft202012Validator(schema)
+
 def validate_json(data):
     """
     Validates the given JSON data against the EVENT_SCHEMA.
     Returns a tuple: (is_valid: bool, message: str)
     """
     try:
-        validate(instance=data, schema=EVENT_SCHEMA)
-        return True, ""
-    except ValidationError as e:
-        return False, f"JSON Validation Error: {e.message}"
+        error = next(get_validator().iter_errors(data), None)
     except SchemaError as e:
         return False, f"Schema Error: {e.message}"
+    if error is not None:
+        return False, f"JSON Validation Error: {error.message}"
+    return True, ""
 
+def _blob_service_client():
+    # One client (and connection pool) per process instead of one per upload
+    global _shared_blob_service_client
+    if _shared_blob_service_client is None:
+        _shared_blob_service_client = BlobServiceClient.from_connection_string(
+            AZURE_STORAGE_CONNECTION_STRING
+        )
+    return _shared_blob_service_client
+
+_shared_blob_service_client = None
 
 def upload_event_data(event_data, blob_name):
     """
@@ -87,9 +113,211 @@ def upload_event_data(event_data, blob_name):
     # Convert the JSON data into a string
     json_str = json.dumps(data_array, indent=2)
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+        blob_client = _blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=blob_name)
         blob_client.upload_blob(json_str, overwrite=True)
         return True, "Event data uploaded successfully!"
     except Exception as e:
         return False, f"Azure Blob Upload Error: {e}"
+
+# ===== Bulk Import =====
+class _ChunkReader:
+    """
+    Text buffer over a file object that is refilled in STREAM_CHUNK_SIZE pieces.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.stream.read(STREAM_CHUNK_SIZE)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        # Next non-whitespace character, or "" at end of file
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+def _iter_json_array(stream):
+    """
+    Yield (location, event) for each element of a JSON array file, decoding one element
+    at a time so the whole document is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    reader = _ChunkReader(stream)
+    if reader.peek() != "[":
+        raise ValueError("Expected a JSON array of events")
+    reader.pos += 1
+    count = 0
+    while True:
+        char = reader.peek()
+        if char == "]":
+            return
+        if count:
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' after item {count}")
+            reader.pos += 1
+            reader.peek()
+        while True:
+            try:
+                item, end = decoder.raw_decode(reader.buf, reader.pos)
+                break
+            except json.JSONDecodeError:
+                # Element spans the chunk boundary; read more unless the file is exhausted
+                if not reader.fill():
+                    raise
+        reader.pos = end
+        count += 1
+        yield f"item {count}", item
+
+def _iter_ndjson(stream):
+    """
+    Yield (location, event or ValueError) for each non-blank line of an NDJSON file.
+    """
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield f"line {line_no}", json.loads(line)
+        except ValueError as e:
+            yield f"line {line_no}", ValueError(f"Invalid JSON: {e}")
+
+def _optional(value):
+    value = (value or "").strip()
+    return value or None
+
+def _event_from_row(row):
+    """
+    Map a flat CSV row (same column names as the Create Event form) to an event object.
+    """
+    event_id = (row.get("id") or "").strip() or "OJC" + str(int(uuid.uuid4().int >> 64))
+    return {
+        "id": event_id,
+        "name": (row.get("name") or "").strip(),
+        "description": (row.get("description") or "").strip(),
+        "start_time": (row.get("start_time") or "").strip(),
+        "end_time": _optional(row.get("end_time")),
+        "place": {
+            "name": (row.get("place_name") or "").strip(),
+            "location": {
+                "city": (row.get("city") or "").strip(),
+                "country": (row.get("country") or "").strip(),
+                "latitude": float(row.get("latitude") or 0),
+                "longitude": float(row.get("longitude") or 0),
+                "state": (row.get("state") or "").strip(),
+                "street": _optional(row.get("street")),
+                "zip": _optional(row.get("zip")),
+            },
+            "id": _optional(row.get("place_id")),
+        },
+        "cover": {
+            "offset_x": int(row.get("offset_x") or 0),
+            "offset_y": int(row.get("offset_y") or 0),
+            "source": (row.get("cover_source") or "").strip(),
+            "id": _optional(row.get("cover_id")),
+        },
+    }
+
+def _iter_csv(stream):
+    """
+    Yield (location, event or ValueError) for each CSV data row.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        location = f"line {reader.line_num}"
+        try:
+            yield location, _event_from_row(row)
+        except ValueError as e:
+            yield location, ValueError(f"Invalid number: {e}")
+
+def _detect_format(filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if ext == ".csv":
+        return "csv"
+    return "json"
+
+def _error_path(error):
+    return "/".join(str(p) for p in error.absolute_path) or "(event)"
+
+def validate_events_stream(stream, fmt="json"):
+    """
+    Stream events from a JSON array, NDJSON or CSV file and validate each one with the
+    compiled validator. Every error is collected in a single pass.
+    Returns a tuple: (accepted events: list, errors: list of "location: path: message")
+    """
+    readers = {"json": _iter_json_array, "ndjson": _iter_ndjson, "csv": _iter_csv}
+    if fmt not in readers:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    validator = get_validator(item=True)
+    accepted, errors, seen_ids = [], [], set()
+    try:
+        for location, item in readers[fmt](stream):
+            if isinstance(item, ValueError):
+                errors.append(f"{location}: {item}")
+                continue
+            item_errors = sorted(validator.iter_errors(item), key=lambda e: list(e.absolute_path))
+            for error in item_errors:
+                errors.append(f"{location}: {_error_path(error)}: {error.message}")
+            if item_errors:
+                continue
+            if item["id"] in seen_ids:
+                errors.append(f"{location}: id: duplicate id {item['id']!r} in import")
+                continue
+            seen_ids.add(item["id"])
+            accepted.append(item)
+    except ValueError as e:
+        # Malformed JSON array: nothing after this point can be located reliably
+        errors.append(f"{fmt} stream: {e}")
+    return accepted, errors
+
+def import_events(path, fmt=None, dry_run=False):
+    """
+    Validate an event file and upsert the accepted events into the event store by id with
+    one conditional write through the app's shared Blob client.
+    Returns a tuple: (success: bool, message: str, errors: list)
+    """
+    fmt = fmt or _detect_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as stream:
+        accepted, errors = validate_events_stream(stream, fmt)
+    if dry_run or not accepted:
+        return not errors, f"{len(accepted)} events valid, {len(errors)} errors.", errors
+
+    from event_utils import update_events, event_hash
+    incoming = {event["id"]: event for event in accepted}
+    def mutate(events):
+        stored = {e.get("id"): event_hash(e) for e in events if e.get("id") in incoming}
+        if all(stored.get(i) == event_hash(e) for i, e in incoming.items()):
+            # Every accepted event is already stored unchanged; skip the write
+            return None
+        return [e for e in events if e.get("id") not in incoming] + accepted
+    success, message = update_events(mutate)
+    if success:
+        message = f"Imported {len(accepted)} events ({len(errors)} rejected)."
+    return success, message, errors
+
+# ===== Command Line =====
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import events into the event store.")
+    parser.add_argument("path", help="JSON array, NDJSON (.ndjson/.jsonl) or CSV file")
+    parser.add_argument("--format", choices=("json", "ndjson", "csv"), help="override format detection")
+    parser.add_argument("--dry-run", action="store_true", help="validate only; do not write")
+    args = parser.parse_args(argv)
+    success, message, errors = import_events(args.path, args.format, args.dry_run)
+    for error in errors:
+        print(error)
+    print(message)
+    return 0 if success and not errors else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,48 @@
 import json
 import time
-import requests
+import base64
+import asyncio
+import hashlib
+import bisect
+import random
+import logging
+import threading
+import http_client
+from functools import lru_cache
 from datetime import datetime, timezone
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceNotModifiedError, ResourceModifiedError, ResourceExistsError, ResourceNotFoundError
+)
 
-from azure_services import blob_service_client
+from azure_services import blob_service_client, async_blob_service_client
 from config import Config
 
+EVENTS_CONTAINER = "events"
+# Legacy single-blob store; migrated into month partitions on first read
+EVENTS_BLOB = "events.json"
+MANIFEST_BLOB = "manifest.json"
+PARTITION_PREFIX = "partitions/"
+UNDATED_PARTITION = "undated"
+# Seconds a replaced partition blob is kept for readers holding an older manifest
+RETIRED_PARTITION_GRACE = 3600
+
+# Index scopes: current and future months only, or the whole archive
+SCOPE_UPCOMING = "upcoming"
+SCOPE_ALL = "all"
+
+logger = logging.getLogger(__name__)
+
+# Per-worker cache of the store manifest (revalidated against its ETag) and the indexes
+# built per scope; partition blobs are immutable and cached by blob name
+_events_cache = {"etag": None, "manifest": None, "indexes": {}, "checked_at": 0.0}
+_partition_cache = {}
+_events_cache_lock = threading.Lock()
+# Partition blobs uploaded for a manifest commit that lost the race: blob name -> time.
+# The next write from this worker retires them, so they are deleted after the grace period.
+_orphaned_partitions = {}
+
+@lru_cache(maxsize=4096)
 def parse_date(date_str):
     """
     Parse ISO date strings to naive UTC datetime.
@@ -21,6 +58,127 @@ def parse_date(date_str):
             continue
     raise ValueError(f"Invalid date format: {date_str}")
 
+def to_epoch(dt):
+    """
+    Convert a naive UTC datetime (as returned by parse_date) to epoch seconds.
+    """
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+class EventIndex:
+    """
+    Events sorted by start time, with each start_time parsed once into an epoch value.
+    Future/past splits and date-window lookups are bisects over `starts`.
+    """
+    def __init__(self, events, version=None):
+        # Event-store version the index was built from (None for ad-hoc lists)
+        self.version = version
+        keyed = []
+        for event in events:
+            try:
+                keyed.append((to_epoch(parse_date(event['start_time'])), event))
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Skipping event with invalid start_time: {event.get('id')}")
+        # Ties on start_time are broken by id so (start, id) keys give a stable order for cursors
+        keyed.sort(key=lambda pair: (pair[0], pair[1].get('id') or ''))
+        self.starts = [ts for ts, _ in keyed]
+        self.keys = [(ts, event.get('id') or '') for ts, event in keyed]
+        self.events = [event for _, event in keyed]
+
+    def __len__(self):
+        return len(self.events)
+
+    def _now(self, now=None):
+        return time.time() if now is None else now
+
+    def split(self, now=None):
+        """
+        Position of the first event starting after `now`; it only moves when an event starts.
+        """
+        return bisect.bisect_right(self.starts, self._now(now))
+
+    def future(self, now=None):
+        """
+        Events starting after `now` (epoch seconds), newest first.
+        """
+        i = bisect.bisect_right(self.starts, self._now(now))
+        return self.events[i:][::-1]
+
+    def past(self, now=None):
+        """
+        Events starting at or before `now` (epoch seconds), newest first.
+        """
+        i = bisect.bisect_right(self.starts, self._now(now))
+        return self.events[:i][::-1]
+
+    def between(self, start, end):
+        """
+        Events with start_time in [start, end) epoch seconds, oldest first.
+        """
+        lo = bisect.bisect_left(self.starts, start)
+        hi = bisect.bisect_left(self.starts, end)
+        return self.events[lo:hi]
+
+    def page(self, upcoming, limit, cursor=None, start=None, end=None, match=None, now=None):
+        """
+        One page of events for cursor pagination. Upcoming pages run soonest first from
+        `now`, past pages newest first. `start`/`end` bound start_time to [start, end)
+        epoch seconds, `match` filters individual events and `cursor` is the (start, id)
+        key of the last event on the previous page.
+        Returns (events, key of the last returned event if more match, else None).
+        """
+        now = self._now(now)
+        if upcoming:
+            lo = bisect.bisect_right(self.starts, now)
+            if start is not None:
+                lo = max(lo, bisect.bisect_left(self.starts, start))
+            if cursor is not None:
+                lo = max(lo, bisect.bisect_right(self.keys, tuple(cursor)))
+            hi = len(self.events) if end is None else bisect.bisect_left(self.starts, end)
+            positions = range(lo, hi)
+        else:
+            hi = bisect.bisect_right(self.starts, now)
+            if end is not None:
+                hi = min(hi, bisect.bisect_left(self.starts, end))
+            if cursor is not None:
+                hi = min(hi, bisect.bisect_left(self.keys, tuple(cursor)))
+            lo = 0 if start is None else bisect.bisect_left(self.starts, start)
+            positions = range(hi - 1, lo - 1, -1)
+        page, last = [], None
+        for i in positions:
+            event = self.events[i]
+            if match is not None and not match(event):
+                continue
+            if len(page) == limit:
+                return page, self.keys[last]
+            page.append(event)
+            last = i
+        return page, None
+
+    def on_day(self, day):
+        """
+        Events starting on the given UTC date, oldest first.
+        """
+        start = to_epoch(datetime(day.year, day.month, day.day))
+        return self.between(start, start + 86400)
+
+def encode_cursor(key):
+    """
+    Opaque page cursor for an EventIndex (start, id) key.
+    """
+    raw = json.dumps([key[0], key[1]], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor; raises ValueError for a malformed cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        ts, event_id = json.loads(raw.decode('utf-8'))
+        return float(ts), str(event_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
 def sort_events_by_date_desc(events):
     """
     Return events sorted by start_time descending.
@@ -31,41 +189,553 @@ def sort_events_by_date_desc(events):
         reverse=True
     )
 
+def partition_key(event):
+    """
+    Month partition ("YYYY-MM") an event is stored in, from its UTC start_time.
+    """
+    try:
+        return parse_date(event['start_time']).strftime('%Y-%m')
+    except (KeyError, TypeError, ValueError):
+        return UNDATED_PARTITION
+
+def _scope_keys(manifest, scope):
+    keys = sorted(manifest["partitions"])
+    if scope == SCOPE_UPCOMING:
+        current = datetime.utcnow().strftime('%Y-%m')
+        keys = [k for k in keys if k != UNDATED_PARTITION and k >= current]
+    return keys
+
+def _blob(name):
+    return blob_service_client.get_blob_client(container=EVENTS_CONTAINER, blob=name)
+
+def _cached_manifest(force):
+    # Returns (manifest, etag, fresh) from the per-worker cache
+    with _events_cache_lock:
+        manifest, etag = _events_cache["manifest"], _events_cache["etag"]
+        fresh = (not force and manifest is not None and
+                 time.time() - _events_cache["checked_at"] < Config.EVENTS_CACHE_REVALIDATE_SECONDS)
+        return manifest, etag, fresh
+
+def _mark_checked(etag):
+    with _events_cache_lock:
+        if _events_cache["etag"] == etag:
+            _events_cache["checked_at"] = time.time()
+
+def _set_manifest(manifest, etag, written=None):
+    """
+    Install a manifest in the per-worker cache. `written` maps partition blob names to
+    event lists this worker just uploaded, so they need not be downloaded again.
+    """
+    with _events_cache_lock:
+        if etag != _events_cache["etag"]:
+            _events_cache["indexes"] = {}
+        _events_cache.update(manifest=manifest, etag=etag, checked_at=time.time())
+        live = {p["blob"] for p in manifest["partitions"].values()}
+        for name in [n for n in _partition_cache if n not in live]:
+            del _partition_cache[name]
+        for name, events in (written or {}).items():
+            if name in live:
+                _partition_cache[name] = events
+
+def _cached_index(etag, cache_key):
+    with _events_cache_lock:
+        if _events_cache["etag"] != etag:
+            return None
+        return _events_cache["indexes"].get(cache_key)
+
+def _store_index(etag, cache_key, index):
+    with _events_cache_lock:
+        if _events_cache["etag"] == etag:
+            _events_cache["indexes"][cache_key] = index
+
+def _missing_partitions(manifest, keys):
+    with _events_cache_lock:
+        return [
+            manifest["partitions"][k]["blob"] for k in keys
+            if manifest["partitions"][k]["blob"] not in _partition_cache
+        ]
+
+def _cache_partition(name, content):
+    events = json.loads(content.decode('utf-8'))
+    with _events_cache_lock:
+        _partition_cache[name] = events
+
+class PartitionEvictedError(RuntimeError):
+    """
+    A concurrent manifest update pruned a cached partition this read was about to use.
+    """
+
+# Read failures that are resolved by re-reading the manifest
+_STALE_MANIFEST_ERRORS = (ResourceNotFoundError, PartitionEvictedError)
+
+def _partition_lists(manifest, keys):
+    # Event lists of already-cached partitions in key order, read under the lock
+    with _events_cache_lock:
+        lists = [_partition_cache.get(manifest["partitions"][k]["blob"]) for k in keys]
+    if any(events is None for events in lists):
+        raise PartitionEvictedError("Event store changed while it was being read; please try again.")
+    return lists
+
+def _partition_events(manifest, keys):
+    # Concatenated event lists of already-cached partitions, in key order
+    return [e for events in _partition_lists(manifest, keys) for e in events]
+
+def _load_manifest(force=False):
+    """
+    Return (manifest, etag) for the event store from the per-worker cache.
+    At most once every EVENTS_CACHE_REVALIDATE_SECONDS (or always when `force` is set)
+    the manifest is re-requested with If-None-Match, so an unchanged store costs one
+    empty round trip. A store that only has the legacy events.json is migrated first.
+    """
+    manifest, etag, fresh = _cached_manifest(force)
+    if fresh:
+        return manifest, etag
+    try:
+        if manifest is not None:
+            downloader = _blob(MANIFEST_BLOB).download_blob(
+                etag=etag, match_condition=MatchConditions.IfModified
+            )
+        else:
+            downloader = _blob(MANIFEST_BLOB).download_blob()
+    except ResourceNotModifiedError:
+        _mark_checked(etag)
+        return manifest, etag
+    except ResourceNotFoundError:
+        return _migrate_legacy_store()
+    manifest = json.loads(downloader.readall().decode('utf-8'))
+    etag = downloader.properties.etag
+    _set_manifest(manifest, etag)
+    return manifest, etag
+
+def _load_partitions(manifest, keys):
+    """
+    Return the concatenated events of the given partitions. Partition blobs are
+    immutable (named by content hash), so each is downloaded at most once per worker.
+    """
+    for name in _missing_partitions(manifest, keys):
+        _cache_partition(name, _blob(name).download_blob().readall())
+    return _partition_events(manifest, keys)
+
+def get_event_index(scope=SCOPE_ALL, force=False):
+    """
+    Return the EventIndex for the partitions in `scope`: SCOPE_UPCOMING reads only the
+    current and future months; SCOPE_ALL also loads the archive (once per worker).
+    """
+    for attempt in range(2):
+        manifest, etag = _load_manifest(force=force or attempt > 0)
+        keys = _scope_keys(manifest, scope)
+        cache_key = (scope, tuple(keys))
+        index = _cached_index(etag, cache_key)
+        if index is not None:
+            return index
+        try:
+            events = _load_partitions(manifest, keys)
+        except _STALE_MANIFEST_ERRORS:
+            # Partition retired by another worker, or pruned by a write in this one
+            if attempt:
+                raise
+            continue
+        index = EventIndex(events, manifest["version"])
+        _store_index(etag, cache_key, index)
+        return index
+
+def get_event_partitions():
+    """
+    Return (version, {partition blob name: events}) for the whole store. Partition blobs
+    are immutable, so a name always identifies the same content.
+    """
+    for attempt in range(2):
+        manifest, _ = _load_manifest(force=attempt > 0)
+        keys = sorted(manifest["partitions"])
+        try:
+            _load_partitions(manifest, keys)
+            lists = _partition_lists(manifest, keys)
+        except _STALE_MANIFEST_ERRORS:
+            if attempt:
+                raise
+            continue
+        names = [manifest["partitions"][k]["blob"] for k in keys]
+        return manifest["version"], dict(zip(names, lists))
+
+async def _load_manifest_async(service, force=False):
+    """
+    Async variant of _load_manifest using the aio Blob client. The cache lock is only
+    held while reading or replacing cache entries, never across an await.
+    """
+    manifest, etag, fresh = _cached_manifest(force)
+    if fresh:
+        return manifest, etag
+    client = service.get_blob_client(container=EVENTS_CONTAINER, blob=MANIFEST_BLOB)
+    try:
+        if manifest is not None:
+            downloader = await client.download_blob(
+                etag=etag, match_condition=MatchConditions.IfModified
+            )
+        else:
+            downloader = await client.download_blob()
+    except ResourceNotModifiedError:
+        _mark_checked(etag)
+        return manifest, etag
+    except ResourceNotFoundError:
+        return await asyncio.to_thread(_migrate_legacy_store)
+    content = await downloader.readall()
+    manifest, etag = json.loads(content.decode('utf-8')), downloader.properties.etag
+    _set_manifest(manifest, etag)
+    return manifest, etag
+
+async def _load_partitions_async(service, manifest, keys):
+    # Download the partitions of `keys` this worker has not cached yet, concurrently
+    async def fetch(name):
+        client = service.get_blob_client(container=EVENTS_CONTAINER, blob=name)
+        downloader = await client.download_blob()
+        _cache_partition(name, await downloader.readall())
+    await asyncio.gather(*(fetch(n) for n in _missing_partitions(manifest, keys)))
+
+async def get_event_index_async(scope=SCOPE_ALL, force=False):
+    """
+    Async variant of get_event_index; missing partitions are downloaded concurrently.
+    """
+    async with async_blob_service_client() as service:
+        for attempt in range(2):
+            manifest, etag = await _load_manifest_async(service, force=force or attempt > 0)
+            keys = _scope_keys(manifest, scope)
+            cache_key = (scope, tuple(keys))
+            index = _cached_index(etag, cache_key)
+            if index is not None:
+                return index
+            try:
+                await _load_partitions_async(service, manifest, keys)
+                events = _partition_events(manifest, keys)
+            except _STALE_MANIFEST_ERRORS:
+                if attempt:
+                    raise
+                continue
+            index = EventIndex(events, manifest["version"])
+            _store_index(etag, cache_key, index)
+            return index
+
+async def get_event_partitions_async():
+    """
+    Async variant of get_event_partitions; missing partitions are downloaded concurrently.
+    """
+    async with async_blob_service_client() as service:
+        for attempt in range(2):
+            manifest, _ = await _load_manifest_async(service, force=attempt > 0)
+            keys = sorted(manifest["partitions"])
+            try:
+                await _load_partitions_async(service, manifest, keys)
+                lists = _partition_lists(manifest, keys)
+            except _STALE_MANIFEST_ERRORS:
+                if attempt:
+                    raise
+                continue
+            names = [manifest["partitions"][k]["blob"] for k in keys]
+            return manifest["version"], dict(zip(names, lists))
+
+def invalidate_events_cache():
+    """
+    Drop the cached manifest and indexes so the next read revalidates the store.
+    Partition blobs are immutable, so their cached contents stay valid.
+    """
+    with _events_cache_lock:
+        _events_cache.update(etag=None, manifest=None, indexes={}, checked_at=0.0)
+
 def get_events_from_blob(future_only=True):
     """
     Download and filter events from Azure Blob.
     """
-    client = blob_service_client.get_blob_client(container="events", blob="events.json")
-    data = client.download_blob().readall().decode('utf-8')
-    events = json.loads(data)
-    now = datetime.utcnow()
     if future_only:
-        events = [e for e in events if parse_date(e['start_time']) > now]
-    else:
-        events = [e for e in events if parse_date(e['start_time']) <= now]
-    return sort_events_by_date_desc(events)
+        return get_event_index(SCOPE_UPCOMING).future()
+    return get_event_index().past()
+
+def _write_store(events, manifest, etag):
+    """
+    Store `events` as month partitions and commit a new manifest, conditional on the
+    manifest ETag that was read (If-Match). Only partitions whose content changed are
+    uploaded; replaced ones are retired and deleted after RETIRED_PARTITION_GRACE.
+    Raises ResourceModifiedError/ResourceExistsError if another writer committed first;
+    the partitions uploaded for that attempt are then retired by the next write.
+    """
+    grouped = {}
+    for event in events:
+        grouped.setdefault(partition_key(event), []).append(event)
+    old = manifest or {"version": 0, "partitions": {}, "retired": {}}
+    partitions, written = {}, {}
+    for key, items in grouped.items():
+        content = json.dumps(items).encode('utf-8')
+        name = f"{PARTITION_PREFIX}{key}-{hashlib.sha256(content).hexdigest()[:16]}.json"
+        if old["partitions"].get(key, {}).get("blob") != name:
+            # Content-addressed: identical partitions written by another worker are reused
+            _blob(name).upload_blob(content, overwrite=True)
+            written[name] = items
+        partitions[key] = {"blob": name, "count": len(items)}
+    now = time.time()
+    live = {p["blob"] for p in partitions.values()}
+    with _events_cache_lock:
+        orphaned = dict(_orphaned_partitions)
+    retired = {n: t for n, t in old.get("retired", {}).items() if n not in live}
+    for entry in old["partitions"].values():
+        if entry["blob"] not in live:
+            retired.setdefault(entry["blob"], now)
+    for name, orphaned_at in orphaned.items():
+        if name not in live:
+            retired.setdefault(name, orphaned_at)
+    expired = [n for n, t in retired.items() if now - t > RETIRED_PARTITION_GRACE]
+    for name in expired:
+        del retired[name]
+    new_manifest = {"version": old["version"] + 1, "partitions": partitions, "retired": retired}
+    content = json.dumps(new_manifest)
+    try:
+        if etag:
+            result = _blob(MANIFEST_BLOB).upload_blob(
+                content, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified
+            )
+        else:
+            # First write: only succeed if nobody else created the manifest meanwhile
+            result = _blob(MANIFEST_BLOB).upload_blob(content, overwrite=False)
+    except (ResourceModifiedError, ResourceExistsError):
+        # Not deleted right away: a concurrent writer may have uploaded the same
+        # content-addressed blob for its own commit
+        with _events_cache_lock:
+            for name in written:
+                _orphaned_partitions.setdefault(name, now)
+        raise
+    new_etag = (result or {}).get('etag')
+    with _events_cache_lock:
+        for name in orphaned:
+            _orphaned_partitions.pop(name, None)
+    _set_manifest(new_manifest, new_etag, written)
+    for name in expired:
+        try:
+            _blob(name).delete_blob()
+        except ResourceNotFoundError:
+            pass
+    return new_manifest, new_etag
+
+def _migrate_legacy_store():
+    """
+    Split the legacy single events.json blob into month partitions and create the
+    manifest. The legacy blob is left in place as a backup.
+    """
+    try:
+        events = json.loads(_blob(EVENTS_BLOB).download_blob().readall().decode('utf-8'))
+    except ResourceNotFoundError:
+        events = []
+    try:
+        manifest, etag = _write_store(events, None, None)
+    except ResourceExistsError:
+        # Another worker migrated first
+        return _load_manifest(force=True)
+    logger.info(f"Migrated {len(events)} events from {EVENTS_BLOB} into {len(manifest['partitions'])} partitions")
+    return manifest, etag
 
 def upload_events_to_blob(events):
     """
-    Upload a list of events to Azure Blob.
+    Replace the whole event list.
+    Request handlers should use update_events so concurrent edits are merged.
     """
-    client = blob_service_client.get_blob_client(container="events", blob="events.json")
-    content = json.dumps(events)
-    client.upload_blob(content, overwrite=True)
-    return True, "Events successfully uploaded to Azure Blob Storage."
+    events = list(events)
+    return update_events(lambda _: events)
 
-def get_facebook_events(access_token):
+def update_events(mutate, max_retries=None):
+    """
+    Optimistic read-modify-write of the event store.
+    `mutate` receives a copy of the full event list and returns the new list, or None
+    when nothing changed (no upload happens). The manifest write is conditional on the
+    ETag that was read (If-Match); if another worker wrote in between, the latest list
+    is re-read and `mutate` re-applied, up to `max_retries` times.
+    Returns a tuple: (success: bool, message: str)
     """
-    Fetch public events from Facebook Graph API.
+    if max_retries is None:
+        max_retries = Config.EVENTS_WRITE_MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        manifest, etag = _load_manifest(force=attempt > 0)
+        try:
+            events = _load_partitions(manifest, sorted(manifest["partitions"]))
+        except _STALE_MANIFEST_ERRORS:
+            continue
+        updated = mutate(list(events))
+        if updated is None:
+            return True, "No event changes to upload."
+        try:
+            _write_store(updated, manifest, etag)
+        except (ResourceModifiedError, ResourceExistsError):
+            logger.info(f"Event store changed during update (attempt {attempt + 1}); retrying")
+            time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+            continue
+        return True, "Events successfully uploaded to Azure Blob Storage."
+    invalidate_events_cache()
+    return False, "The event list was changed by someone else; please try again."
+
+def append_events(new_events):
+    """
+    Add events whose id is not already in the store.
+    """
+    def mutate(events):
+        existing = {e.get('id') for e in events}
+        added = [e for e in new_events if e.get('id') not in existing]
+        if not added:
+            return None
+        return events + added
+    return update_events(mutate)
+
+def patch_events(patches):
+    """
+    Merge field updates into stored events; `patches` maps event id -> dict of fields.
+    """
+    def mutate(events):
+        changed = False
+        result = []
+        for event in events:
+            fields = patches.get(event.get('id'))
+            if fields and any(event.get(k) != v for k, v in fields.items()):
+                event = dict(event, **fields)
+                changed = True
+            result.append(event)
+        return result if changed else None
+    return update_events(mutate)
+
+def remove_events(event_ids):
     """
-    url = f"https://graph.facebook.com/v22.0/{Config.FACEBOOK_PAGE_ID}/events"
+    Remove events by id.
+    """
+    event_ids = set(event_ids)
+    def mutate(events):
+        kept = [e for e in events if e.get('id') not in event_ids]
+        return kept if len(kept) != len(events) else None
+    return update_events(mutate)
+
+def event_hash(event):
+    """
+    Stable content hash of an event, used to detect changed fields without a deep compare.
+    """
+    encoded = json.dumps(event, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def merge_facebook_events(events, fb_events, now=None):
+    """
+    Merge fetched Facebook events into the stored list by id.
+    New ids are added, events whose content hash differs are replaced in place, and
+    stored upcoming Facebook events that Facebook no longer lists are removed. OJC events
+    and past Facebook events are kept as they are.
+    Returns (merged list or None when nothing changed, {'added', 'updated', 'removed'}).
+    """
+    now = datetime.utcnow() if now is None else now
+    incoming = {}
+    for event in fb_events:
+        if event.get('id'):
+            incoming[event['id']] = event
+    counts = {'added': 0, 'updated': 0, 'removed': 0}
+    merged, seen = [], set()
+    for event in events:
+        event_id = event.get('id') or ''
+        fb_event = incoming.get(event_id)
+        if fb_event is not None:
+            seen.add(event_id)
+            if event_hash(fb_event) != event_hash(event):
+                counts['updated'] += 1
+                event = fb_event
+        elif not event_id.startswith('OJC') and not _is_past(event, now):
+            counts['removed'] += 1
+            continue
+        merged.append(event)
+    for event_id, fb_event in incoming.items():
+        if event_id not in seen:
+            counts['added'] += 1
+            merged.append(fb_event)
+    if not any(counts.values()):
+        return None, counts
+    return sort_events_by_date_desc(merged), counts
+
+def _is_past(event, now):
+    try:
+        return parse_date(event['start_time']) <= now
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def sync_facebook_events(fb_events):
+    """
+    Merge `fb_events` into the event store with a conditional write; the blob is only
+    rewritten when the merge changed something.
+    Returns a tuple: (success: bool, message: str, counts: dict)
+    """
+    counts = {}
+    def mutate(events):
+        merged, result = merge_facebook_events(events, fb_events)
+        counts.clear()
+        counts.update(result)
+        return merged
+    success, msg = update_events(mutate)
+    if success:
+        msg = (f"Facebook events synced: {counts['added']} added, "
+               f"{counts['updated']} updated, {counts['removed']} removed.")
+    return success, msg, dict(counts)
+
+FACEBOOK_EVENTS_URL = "https://graph.facebook.com/v22.0/{page_id}/events"
+FACEBOOK_EVENT_FIELDS = "id,name,description,start_time,end_time,place,cover"
+FACEBOOK_PAGE_LIMIT = 100
+
+def _facebook_events_request(access_token):
+    url = FACEBOOK_EVENTS_URL.format(page_id=Config.FACEBOOK_PAGE_ID)
     params = {
         "access_token": access_token,
-        "since": int(time.time()),
-        "fields": "id,name,description,start_time,end_time,place,cover"
+        "since": str(int(time.time())),
+        "limit": str(FACEBOOK_PAGE_LIMIT),
+        "fields": FACEBOOK_EVENT_FIELDS
     }
-    resp = requests.get(url, params=params)
-    data = resp.json()
-    if resp.status_code != 200 or 'error' in data:
+    return url, params
+
+def _facebook_page(status, data):
+    # Returns (events, next page URL or None) for one /events response
+    data = data or {}
+    if status != 200 or 'error' in data:
         raise RuntimeError(f"Facebook API error: {data.get('error')}")
-    return data.get('data', [])
\ No newline at end of file
+    return data.get('data', []), (data.get('paging') or {}).get('next')
+
+def get_facebook_events(access_token):
+    """
+    Fetch all upcoming public events from Facebook Graph API, following paging.next.
+    """
+    url, params = _facebook_events_request(access_token)
+    events, seen = [], set()
+    while url and url not in seen:
+        seen.add(url)
+        resp = http_client.get(url, params=params)
+        try:
+            data = resp.json()
+        except ValueError:
+            data = None
+        page, url = _facebook_page(resp.status_code, data)
+        events.extend(page)
+        # paging.next already carries the token and cursor
+        params = None
+    return events
+
+async def get_facebook_events_async(http_session, access_token):
+    """
+    Async variant of get_facebook_events over an aiohttp session.
+    """
+    url, params = _facebook_events_request(access_token)
+    events, seen = [], set()
+    while url and url not in seen:
+        seen.add(url)
+        status, data = await http_client.request_async(http_session, "GET", url, params=params)
+        page, url = _facebook_page(status, data)
+        events.extend(page)
+        params = None
+    return events
+
+async def exchange_facebook_code_async(http_session, code):
+    """
+    Exchange an OAuth callback code for a Facebook user access token (None on failure).
+    """
+    params = {
+        'client_id': Config.FACEBOOK_APP_ID,
+        'redirect_uri': Config.FACEBOOK_REDIRECT_URI,
+        'client_secret': Config.FACEBOOK_APP_SECRET,
+        'code': code
+    }
+    status, data = await http_client.request_async(
+        http_session, "GET", 'https://graph.facebook.com/v22.0/oauth/access_token', params=params
+    )
+    return (data or {}).get('access_token')
\ No newline at end of file
@@ -1,45 +1,192 @@
 """
 Events blueprint: manages event creation, deletion, Facebook syncing, and scheduled reminder emails.
 """
+import os
 import uuid
 import json
-import requests
-from datetime import datetime
-from flask import Blueprint, jsonify, request, render_template, flash, redirect, url_for, session, Response
+import time
+import http_client
+from datetime import datetime, timedelta
+from flask import (
+    Blueprint, jsonify, request, render_template, flash, redirect, url_for, session,
+    Response, send_file, current_app
+)
 from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
 from config import Config
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotModifiedError, ResourceNotFoundError, HttpResponseError
 from azure_services import blob_service_client
+from image_cache import DiskLRUCache
+from response_cache import JSONResponseCache
+from blob_sas import sas_available, generate_upload_url, generate_read_url
 from event_utils import (
-    parse_date, sort_events_by_date_desc,
-    get_events_from_blob, upload_events_to_blob,
-    get_facebook_events
+    parse_date, to_epoch, encode_cursor, decode_cursor,
+    SCOPE_ALL, SCOPE_UPCOMING, get_event_index, get_event_index_async, exchange_facebook_code_async,
+    append_events, remove_events
 )
-from emails import send_event_reminder_email
+from facebook_sync import exchange_for_page_token_async, store_page_token, start_facebook_sync
+from event_geo_index import get_geo_index
+from event_search import search_events_async
+from emails import render_event_reminder_emails, send_bulk_emails
 
 events_bp = Blueprint('events', __name__)
 
+# Hot cover images kept on local disk so repeat views skip the blob download
+event_image_cache = DiskLRUCache(
+    max_bytes=Config.EVENT_IMAGE_CACHE_MAX_BYTES,
+    max_item_bytes=Config.EVENT_IMAGE_CACHE_MAX_ITEM_BYTES,
+    base_dir=Config.EVENT_IMAGE_CACHE_DIR
+)
+# Serialized, compressed event list pages for the current event-store version
+event_response_cache = JSONResponseCache(max_entries=Config.EVENTS_RESPONSE_CACHE_ENTRIES)
+
+def _parse_day(value):
+    return to_epoch(datetime.strptime(value, '%Y-%m-%d'))
+
+def _event_filter(city, state, source):
+    if not (city or state or source):
+        return None
+    def match(event):
+        location = (event.get('place') or {}).get('location') or {}
+        if city and (location.get('city') or '').strip().lower() != city:
+            return False
+        if state and (location.get('state') or '').strip().lower() != state:
+            return False
+        is_ojc = (event.get('id') or '').startswith('OJC')
+        if source and is_ojc != (source == 'ojc'):
+            return False
+        return True
+    return match
+
+def _page_query():
+    """
+    Parse the pagination and filter query args shared by the event list endpoints:
+    limit, cursor, from/to (YYYY-MM-DD, inclusive), city, state and source (ojc|facebook).
+    Raises ValueError for invalid values.
+    """
+    args = request.args
+    limit = int(args.get('limit', Config.EVENTS_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    source = (args.get('source') or '').strip().lower() or None
+    if source not in (None, 'ojc', 'facebook'):
+        raise ValueError("source must be 'ojc' or 'facebook'")
+    return {
+        'limit': min(limit, Config.EVENTS_MAX_PAGE_SIZE),
+        'cursor': decode_cursor(args['cursor']) if args.get('cursor') else None,
+        'start': _parse_day(args['from']) if args.get('from') else None,
+        'end': _parse_day(args['to']) + 86400 if args.get('to') else None,
+        'match': _event_filter(
+            (args.get('city') or '').strip().lower(),
+            (args.get('state') or '').strip().lower(),
+            source
+        ),
+    }
+
+def _event_page(index, upcoming):
+    """
+    Serve a page from the encoded response cache. Entries are keyed by the query and
+    the (start, id) key of the first event that has not started yet, which identifies
+    the future/past boundary independently of which partitions the index holds; the
+    cache is bound to the event-store version.
+    """
+    now = time.time()
+    split = index.split(now)
+    boundary = index.keys[split] if split < len(index.keys) else None
+    key = (upcoming, boundary, tuple(sorted(request.args.items(multi=True))))
+    entry = event_response_cache.get(index.version, key)
+    if entry is None:
+        try:
+            query = _page_query()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        events, next_key = index.page(upcoming, now=now, **query)
+        entry = event_response_cache.put(index.version, key, {
+            'events': events,
+            'next_cursor': encode_cursor(next_key) if next_key else None
+        })
+    return entry.respond()
+
 @events_bp.route('/blob-events')
 @login_required
-def blob_events():
-    # Return future events from blob
+async def blob_events():
+    """
+    Return a page of upcoming events, soonest first.
+    """
     try:
-        events = get_events_from_blob(future_only=True)
-        return jsonify(events)
+        index = await get_event_index_async(SCOPE_UPCOMING)
+        return _event_page(index, upcoming=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
 @events_bp.route('/list_old_events', methods=['GET'])
 @login_required
-def list_old_events():
+async def list_old_events():
+    """
+    Return a page of past (non-future) events from blob storage, newest first.
+    """
+    try:
+        # Archive partitions are loaded on first use
+        index = await get_event_index_async()
+        return _event_page(index, upcoming=False)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@events_bp.route('/events/nearby')
+@login_required
+async def nearby_events():
+    """
+    Return events within radius_km of lat/lon, nearest first, each with distance_km.
+    Pass future_only=1 to skip past events.
+    """
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius_km = float(request.args.get('radius_km', 50))
+        limit = min(int(request.args.get('limit', Config.EVENTS_PAGE_SIZE)), Config.EVENTS_MAX_PAGE_SIZE)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon are required; radius_km and limit must be numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat/lon out of range'}), 400
+    if not 0 < radius_km <= Config.EVENTS_NEARBY_MAX_RADIUS_KM:
+        return jsonify({'error': f'radius_km must be in (0, {Config.EVENTS_NEARBY_MAX_RADIUS_KM}]'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    future_only = request.args.get('future_only', '').lower() in ('1', 'true', 'yes')
+    scope = SCOPE_UPCOMING if future_only else SCOPE_ALL
+    try:
+        index = await get_event_index_async(scope)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    matches = get_geo_index(index, scope).nearby(
+        lat, lon, radius_km, after=time.time() if future_only else None, limit=limit
+    )
+    return jsonify({
+        'events': [dict(event, distance_km=round(distance, 2)) for event, distance in matches]
+    })
+
+@events_bp.route('/events/search')
+@login_required
+async def search_events_view():
     """
-    Return past (non-future) events from blob storage.
+    Full-text search over event names, descriptions and places, best match first.
+    The last word is matched as a prefix unless the query ends with a space.
     """
+    query = request.args.get('q', '')
     try:
-        # future_only=False to retrieve past and current events
-        events = get_events_from_blob(future_only=False)
-        return jsonify({'events': events})
+        limit = min(int(request.args.get('limit', Config.EVENTS_PAGE_SIZE)), Config.EVENTS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    if not query.strip() or limit < 1:
+        return jsonify({'events': []})
+    try:
+        results = await search_events_async(query, limit, prefix=not query[-1].isspace())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'events': [dict(event, score=round(score, 3)) for event, score in results]
+    })
 
 @events_bp.route('/create_event', methods=['GET', 'POST'])
 @login_required
@@ -74,9 +221,12 @@ def create_event():
                 'id': data.get('cover_id') or None,
             }
         }
-        # Handle cover image upload
+        # Handle cover image: uploaded directly to Blob Storage via SAS, or posted here
+        cover_blob = data.get('cover_blob', '').strip()
         cover_file = request.files.get('cover_image')
-        if cover_file:
+        if cover_blob:
+            event['cover']['source'] = url_for('events.event_image', filename=cover_blob)
+        elif cover_file:
             # Upload cover image to Azure Blob Storage
             blob_client = blob_service_client.get_blob_client(
                 container='event-images', blob=cover_file.filename
@@ -88,10 +238,8 @@ def create_event():
             )
         else:
             event['cover']['source'] = data.get('cover_source', '').strip()
-        # Append and upload
-        events = get_events_from_blob(future_only=True)
-        events.append(event)
-        success, msg = upload_events_to_blob(events)
+        # Append with a conditional write so concurrent edits are merged, not lost
+        success, msg = append_events([event])
         flash(msg, 'success' if success else 'danger')
         return redirect(url_for('index', section='events'))
     # GET: render the Create Event form
@@ -103,19 +251,17 @@ def delete_event(event_id):
     if current_user.job_title != 'OJC Board Member':
         flash('Not authorized to delete events.', 'danger')
         return redirect(url_for('index'))
-    events = get_events_from_blob(future_only=True)
-    filtered = [e for e in events if e.get('id') != event_id]
-    success, msg = upload_events_to_blob(filtered)
+    success, msg = remove_events([event_id])
     flash(msg, 'success' if success else 'danger')
     return redirect(url_for('index', section='events'))
 
 @events_bp.route('/fb-events')
 @login_required
-def fb_events():
-    token = session.get('fb_access_token')
+async def fb_events():
+    # Upcoming Facebook events as last synced into the event store by the background job
     try:
-        fb_events = get_facebook_events(token)
-        return jsonify(sort_events_by_date_desc(fb_events))
+        index = await get_event_index_async(SCOPE_UPCOMING)
+        return jsonify([e for e in index.future() if not e.get('id', '').startswith('OJC')])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -128,7 +274,7 @@ def sync_public_events():
         'client_id': Config.FACEBOOK_APP_ID,
         'redirect_uri': Config.FACEBOOK_REDIRECT_URI,
         'state': state,
-        'scope': 'pages_read_engagement,pages_read_user_content',
+        'scope': 'pages_show_list,pages_read_engagement,pages_read_user_content',
         'response_type': 'code'
     }
     from urllib.parse import urlencode
@@ -136,76 +282,198 @@ def sync_public_events():
     return redirect(url)
 
 @events_bp.route('/facebook/callback')
-def facebook_callback():
+async def facebook_callback():
     if request.args.get('state') != session.get('fb_state'):
         return 'State mismatch', 400
     code = request.args.get('code')
     if not code:
         return 'No code', 400
-    token_url = 'https://graph.facebook.com/v22.0/oauth/access_token'
-    params = {
-        'client_id': Config.FACEBOOK_APP_ID,
-        'redirect_uri': Config.FACEBOOK_REDIRECT_URI,
-        'client_secret': Config.FACEBOOK_APP_SECRET,
-        'code': code
-    }
-    resp = requests.get(token_url, params=params)
-    data = resp.json()
-    access_token = data.get('access_token')
-    if not access_token:
-        return 'Error fetching token', 400
-    session['fb_access_token'] = access_token
-    # Sync events
-    fb_events = get_facebook_events(access_token)
-    local = [e for e in get_events_from_blob(future_only=True) if e.get('id', '').startswith('OJC')]
-    combined = local + fb_events
-    success, msg = upload_events_to_blob(sort_events_by_date_desc(combined))
-    flash('Facebook events synced' if success else msg, 'success' if success else 'danger')
+    async with http_client.async_session() as http_session:
+        user_token = await exchange_facebook_code_async(http_session, code)
+        if not user_token:
+            return 'Error fetching token', 400
+        page_token = await exchange_for_page_token_async(http_session, user_token)
+    if not page_token:
+        flash('Could not obtain a Facebook page token; check the page permissions.', 'danger')
+        return redirect(url_for('index', section='events'))
+    session.pop('fb_state', None)
+    # Stored encrypted for the scheduled sync job, which also runs once right away
+    store_page_token(page_token)
+    start_facebook_sync()
+    flash('Facebook page connected; events will sync in the background.', 'success')
     return redirect(url_for('index', section='events'))
 
+def _image_cache_headers(resp, etag):
+    resp.headers['Accept-Ranges'] = 'bytes'
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    resp.cache_control.max_age = Config.EVENT_IMAGE_MAX_AGE
+    if etag:
+        resp.set_etag(etag.strip('"'))
+    return resp
+
+def _send_cached_image(entry):
+    # make_conditional answers If-None-Match and Range (304/206) from the local copy
+    resp = send_file(entry['path'], mimetype=entry['content_type'], conditional=False, etag=False)
+    _image_cache_headers(resp, entry['etag'])
+    return resp.make_conditional(request, accept_ranges=True, complete_length=entry['size'])
+
+def _single_byte_range():
+    """
+    Return (offset, length) for a simple `bytes=a-b` / `bytes=a-` request, else None.
+    """
+    rng = request.range
+    if not rng or rng.units != 'bytes' or len(rng.ranges) != 1:
+        return None
+    begin, end = rng.ranges[0]
+    if begin is None or begin < 0:
+        return None
+    return begin, (end - begin if end is not None else None)
+
+@events_bp.route('/event-image/upload-url', methods=['POST'])
+@login_required
+def event_image_upload_url():
+    """
+    Issue a short-lived, write-only SAS URL so the browser uploads a cover image
+    straight to the event-images container.
+    """
+    if not Config.EVENT_IMAGE_DIRECT_ACCESS or not sas_available():
+        return jsonify({'error': 'Direct uploads are not available'}), 404
+    data = request.get_json(silent=True) or request.form
+    content_type = (data.get('content_type') or '').strip()
+    if not content_type.startswith('image/'):
+        return jsonify({'error': 'Only image uploads are allowed'}), 400
+    _, ext = os.path.splitext(secure_filename(data.get('filename') or ''))
+    blob_name = f"{uuid.uuid4().hex}{ext.lower()}"
+    upload_url = generate_upload_url(
+        'event-images', blob_name, Config.EVENT_IMAGE_SAS_UPLOAD_TTL
+    )
+    return jsonify({
+        'upload_url': upload_url,
+        'blob_name': blob_name,
+        'image_url': url_for('events.event_image', filename=blob_name)
+    })
+
 @events_bp.route('/event-image/<path:filename>')
 @login_required
 def event_image(filename):
     """
-    Proxy and serve event cover images from Azure Blob Storage.
+    Serve event cover images from Azure Blob Storage.
+    By default this redirects to a read-only SAS URL; with direct access disabled (or
+    `?proxy=1`) images are streamed through the app instead. Content type and ETag
+    come from the single download response; If-None-Match and Range are honoured,
+    and hot images are kept in a bounded per-worker disk cache.
     """
-    try:
-        blob_client = blob_service_client.get_blob_client(
-            container='event-images', blob=filename
-        )
-        data = blob_client.download_blob().readall()
-        props = blob_client.get_blob_properties()
-        content_type = (
-            props.content_settings.content_type or 'application/octet-stream'
+    if (Config.EVENT_IMAGE_DIRECT_ACCESS and not request.args.get('proxy')
+            and sas_available()):
+        read_url, valid_for = generate_read_url(
+            'event-images', filename, Config.EVENT_IMAGE_SAS_READ_TTL
         )
-        return Response(data, mimetype=content_type)
-    except Exception:
-        return ('', 404)
+        resp = redirect(read_url, code=302)
+        resp.cache_control.private = True
+        resp.cache_control.max_age = max(valid_for - 60, 0)
+        return resp
+    entry = event_image_cache.get(filename)
+    blob_client = blob_service_client.get_blob_client(
+        container='event-images', blob=filename
+    )
+    if entry:
+        if time.time() - entry['checked_at'] < Config.EVENT_IMAGE_CACHE_TTL:
+            return _send_cached_image(entry)
+        try:
+            downloader = blob_client.download_blob(
+                etag=entry['etag'], match_condition=MatchConditions.IfModified
+            )
+        except ResourceNotModifiedError:
+            event_image_cache.touch(filename)
+            return _send_cached_image(entry)
+        except ResourceNotFoundError:
+            event_image_cache.discard(filename)
+            return ('', 404)
+        except Exception:
+            current_app.logger.exception(f"Error revalidating event image {filename}")
+            return _send_cached_image(entry)
+        event_image_cache.discard(filename)
+        byte_range = None
+    else:
+        byte_range = _single_byte_range()
+        client_etags = request.if_none_match
+        try:
+            if byte_range:
+                offset, length = byte_range
+                downloader = blob_client.download_blob(offset=offset, length=length)
+            elif client_etags and not client_etags.star_tag and len(client_etags.as_set()) == 1:
+                downloader = blob_client.download_blob(
+                    etag=f'"{next(iter(client_etags.as_set()))}"',
+                    match_condition=MatchConditions.IfModified
+                )
+            else:
+                downloader = blob_client.download_blob()
+        except ResourceNotModifiedError:
+            resp = Response(status=304)
+            return _image_cache_headers(resp, next(iter(client_etags.as_set())))
+        except HttpResponseError as e:
+            if e.status_code == 416:
+                return ('', 416)
+            return ('', 404)
+        except Exception:
+            return ('', 404)
+
+    props = downloader.properties
+    content_type = props.content_settings.content_type or 'application/octet-stream'
+    etag = props.etag
+    writer = None
+    if not byte_range and downloader.size <= event_image_cache.max_item_bytes:
+        writer = event_image_cache.writer(filename, etag, content_type)
+
+    def generate():
+        try:
+            for chunk in downloader.chunks():
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+            if writer:
+                writer.commit()
+        finally:
+            if writer:
+                writer.abort()
+
+    resp = Response(generate(), mimetype=content_type, direct_passthrough=True)
+    resp.headers['Content-Length'] = str(downloader.size)
+    if byte_range:
+        resp.status_code = 206
+        resp.headers['Content-Range'] = props.content_range
+    return _image_cache_headers(resp, etag)
 
 def check_event_reminders():
     """
     Scheduled job: send event reminder emails.
     """
     from user_services import get_all_users
-    # Acquire events and users
-    events = get_events_from_blob(future_only=True)
-    users = get_all_users()
+    from datetime import datetime as _dt
+    # Events starting exactly 15, 8 or 1 days from today are range lookups on the index
+    index = get_event_index(SCOPE_UPCOMING)
     today = datetime.utcnow().date()
-    for event in events:
-        try:
-            event_date = parse_date(event['start_time']).date()
-        except Exception:
-            continue
-        days_left = (event_date - today).days
-        if days_left in [15, 8, 1]:
-            for user in users:
-                expiration_ts = user.get('extension_b32ce28f40e2412fb56abae06a1ac8ab_MemberExpirationDate')
-                if expiration_ts and (expiration_ts / 1000 if expiration_ts > 1e10 else expiration_ts):
-                    from datetime import datetime as _dt
-                    exp_date = _dt.fromtimestamp(
-                        expiration_ts / 1000 if expiration_ts > 1e10 else expiration_ts
-                    ).date()
-                    if event_date < exp_date:
-                        recipient = user.get('mailNickname', '').replace('_at_', '@')
-                        name = user.get('displayName', 'Member')
-                        send_event_reminder_email(recipient, name, event, days_left)
\ No newline at end of file
+    due = []
+    for days_left in [15, 8, 1]:
+        for event in index.on_day(today + timedelta(days=days_left)):
+            due.append((event, days_left))
+    if not due:
+        return
+    users = get_all_users()
+    messages = []
+    for event, days_left in due:
+        event_date = parse_date(event['start_time']).date()
+        recipients = []
+        for user in users:
+            expiration_ts = user.get('extension_b32ce28f40e2412fb56abae06a1ac8ab_MemberExpirationDate')
+            if expiration_ts and (expiration_ts / 1000 if expiration_ts > 1e10 else expiration_ts):
+                exp_date = _dt.fromtimestamp(
+                    expiration_ts / 1000 if expiration_ts > 1e10 else expiration_ts
+                ).date()
+                if event_date < exp_date:
+                    recipient = user.get('mailNickname', '').replace('_at_', '@')
+                    name = user.get('displayName', 'Member')
+                    recipients.append((recipient, name))
+        messages.extend(render_event_reminder_emails(event, days_left, recipients))
+    send_bulk_emails(messages)
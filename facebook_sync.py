@@ -0,0 +1,118 @@
+"""
+Background Facebook event sync. The OAuth callback exchanges the admin's short-lived
+user token for a long-lived Page access token, which is stored encrypted in the
+AppSecrets Azure Table. A scheduled job then uses that token to pull the Page's events
+and merge them into the event store, so no user request waits on graph.facebook.com.
+"""
+import base64
+import hashlib
+import threading
+import logging
+from cryptography.fernet import Fernet, InvalidToken
+from azure.core.exceptions import ResourceNotFoundError
+from azure.data.tables import UpdateMode
+
+import http_client
+from azure_services import app_secrets_table_client
+from event_utils import get_facebook_events, sync_facebook_events
+from job_lock import run_exclusive
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FACEBOOK_GRAPH_URL = "https://graph.facebook.com/v22.0"
+TOKEN_PARTITION = "facebook"
+TOKEN_ROW = "page-token"
+SYNC_JOB_ID = "facebook_sync"
+
+def _fernet():
+    key = Config.FACEBOOK_TOKEN_KEY
+    if not key:
+        # Derive a stable key from the Flask secret when no dedicated key is configured
+        key = base64.urlsafe_b64encode(hashlib.sha256(Config.SECRET_KEY.encode("utf-8")).digest())
+    return Fernet(key)
+
+async def exchange_for_page_token_async(http_session, user_token):
+    """
+    Exchange a short-lived user token for a long-lived one, then fetch the Page access
+    token it grants (Page tokens derived from a long-lived user token do not expire).
+    Returns the Page token or None.
+    """
+    params = {
+        "grant_type": "fb_exchange_token",
+        "client_id": Config.FACEBOOK_APP_ID,
+        "client_secret": Config.FACEBOOK_APP_SECRET,
+        "fb_exchange_token": user_token,
+    }
+    status, data = await http_client.request_async(
+        http_session, "GET", f"{FACEBOOK_GRAPH_URL}/oauth/access_token", params=params
+    )
+    long_lived = (data or {}).get("access_token")
+    if status != 200 or not long_lived:
+        logger.error(f"Facebook long-lived token exchange failed: {(data or {}).get('error')}")
+        return None
+    status, data = await http_client.request_async(
+        http_session, "GET", f"{FACEBOOK_GRAPH_URL}/{Config.FACEBOOK_PAGE_ID}",
+        params={"fields": "access_token", "access_token": long_lived}
+    )
+    page_token = (data or {}).get("access_token")
+    if status != 200 or not page_token:
+        logger.error(f"Facebook page token request failed: {(data or {}).get('error')}")
+        return None
+    return page_token
+
+def store_page_token(token):
+    """
+    Encrypt and persist the Page access token used by the sync job.
+    """
+    entity = {
+        "PartitionKey": TOKEN_PARTITION,
+        "RowKey": TOKEN_ROW,
+        "Token": _fernet().encrypt(token.encode("utf-8")).decode("ascii"),
+        "PageId": Config.FACEBOOK_PAGE_ID,
+    }
+    app_secrets_table_client.upsert_entity(entity=entity, mode=UpdateMode.REPLACE)
+
+def load_page_token():
+    """
+    Return the stored Page access token, or None if none is stored or it cannot be decrypted.
+    """
+    try:
+        entity = app_secrets_table_client.get_entity(TOKEN_PARTITION, TOKEN_ROW)
+    except ResourceNotFoundError:
+        return None
+    if entity.get("PageId") != Config.FACEBOOK_PAGE_ID:
+        return None
+    try:
+        return _fernet().decrypt(entity["Token"].encode("ascii")).decode("utf-8")
+    except (InvalidToken, KeyError):
+        logger.error("Stored Facebook page token could not be decrypted; reconnect the page")
+        return None
+
+def sync_facebook_page_events():
+    """
+    Scheduled job: fetch the Page's upcoming events with the stored token and merge
+    them into the event store. Returns the added/updated/removed counts, or None.
+    """
+    token = load_page_token()
+    if not token:
+        logger.info("No Facebook page token stored; skipping event sync")
+        return None
+    fb_events = get_facebook_events(token)
+    success, msg, counts = sync_facebook_events(fb_events)
+    if success:
+        logger.info(msg)
+    else:
+        logger.warning(f"Facebook event sync failed: {msg}")
+    return counts
+
+def start_facebook_sync():
+    """
+    Run a sync now in a background thread (e.g. right after the page is connected).
+    """
+    def run():
+        try:
+            run_exclusive(SYNC_JOB_ID, sync_facebook_page_events, 0)
+        except Exception:
+            logger.exception("Facebook event sync failed")
+    threading.Thread(target=run, name="facebook-sync", daemon=True).start()
@@ -0,0 +1,172 @@
+"""
+Graph credential provider: keeps one MSAL confidential client per worker process and
+reuses the Microsoft Graph client-credentials token until shortly before it expires.
+"""
+import os
+import time
+import threading
+import logging
+import msal
+import http_client
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
+# Seconds to keep serving a still-valid token after a failed refresh before trying again
+FAILURE_BACKOFF = 30
+
+class GraphTokenProvider:
+    """
+    Thread-safe cache for the app-only Graph access token.
+    A single lock guards token acquisition so concurrent requests wait on one fetch
+    instead of each starting their own. Once a token has been used, a background
+    timer refreshes it `refresh_margin` seconds before it expires. If a refresh fails,
+    the still-valid old token is served for FAILURE_BACKOFF seconds before the next try.
+    """
+    def __init__(self, client_id, client_secret, authority, scopes=None,
+                 refresh_margin=300, background_refresh=True):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.authority = authority
+        self.scopes = scopes or GRAPH_SCOPES
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Called on first use and again after a fork (gunicorn workers do not inherit timers)
+        self._pid = os.getpid()
+        self._app = None
+        self._token = None
+        self._expires_at = 0.0
+        self._retry_after = 0.0
+        self._used = False
+        self._timer = None
+        self._stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'failures': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _fresh(self):
+        if self._token is None:
+            return False
+        now = time.time()
+        if now < self._expires_at - self.refresh_margin:
+            return True
+        # A refresh failed recently: keep the old token until the back-off ends
+        return now < self._retry_after and now < self._expires_at
+
+    def _get_app(self):
+        if self._app is None:
+            self._app = msal.ConfidentialClientApplication(
+                self.client_id,
+                client_credential=self.client_secret,
+                authority=self.authority,
+                http_client=http_client.get_session(),
+                timeout=Config.HTTP_READ_TIMEOUT
+            )
+        return self._app
+
+    def get_token(self):
+        """
+        Return a valid access token, or None if one could not be acquired.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        if self._fresh():
+            self._used = True
+            self._count('hits')
+            return self._token
+        with self._lock:
+            # Another thread may have fetched a token while we waited on the lock
+            if self._fresh():
+                self._used = True
+                self._count('hits')
+                return self._token
+            self._count('misses')
+            token = self._fetch()
+            self._used = True
+            return token
+
+    def _fetch(self):
+        # Must be called with self._lock held
+        try:
+            result = self._get_app().acquire_token_for_client(scopes=self.scopes)
+        except Exception:
+            logger.exception("Graph token acquisition raised")
+            result = {}
+        token = result.get("access_token")
+        if not token:
+            self._count('failures')
+            self._retry_after = time.time() + FAILURE_BACKOFF
+            logger.error(f"Unable to acquire Graph API token: {result.get('error_description') or result.get('error')}")
+            # Keep serving the previous token while it has not actually expired
+            if self._token and time.time() < self._expires_at:
+                return self._token
+            return None
+        self._token = token
+        self._expires_at = time.time() + int(result.get("expires_in", 3600))
+        self._retry_after = 0.0
+        self._used = False
+        self._schedule_refresh()
+        return token
+
+    def _schedule_refresh(self):
+        if not self.background_refresh:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(self._expires_at - self.refresh_margin - time.time(), 1)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            self._timer = None
+            # Let idle workers lapse; the next request will fetch on demand
+            if not self._used or self._pid != os.getpid():
+                return
+            self._count('refreshes')
+            self._fetch()
+
+    def invalidate(self):
+        """
+        Drop the cached token, e.g. after Graph rejects it with a 401.
+        """
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+            self._retry_after = 0.0
+
+    def stats(self):
+        """
+        Return a snapshot of the hit/miss/refresh/failure counters.
+        """
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['expires_in'] = max(int(self._expires_at - time.time()), 0) if self._token else 0
+        return snapshot
+
+# Shared per-process provider for app-only Microsoft Graph calls
+graph_token_provider = GraphTokenProvider(
+    Config.CLIENT_ID,
+    Config.CLIENT_SECRET,
+    Config.AAD_AUTHORITY,
+    refresh_margin=Config.GRAPH_TOKEN_REFRESH_MARGIN
+)
+
+def acquire_graph_api_token():
+    """
+    Return a cached Microsoft Graph access token for the app's client credentials.
+    """
+    return graph_token_provider.get_token()
+
+def graph_token_stats():
+    return graph_token_provider.stats()
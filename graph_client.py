@@ -0,0 +1,159 @@
+"""
+Microsoft Graph client with JSON $batch support: independent and dependent (dependsOn)
+operations are combined into as few POST /$batch round trips as possible (20 per batch)
+and the per-operation responses are split back out by id.
+"""
+import time
+import logging
+import http_client
+from graph_auth import acquire_graph_api_token, graph_token_provider
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+MAX_BATCH_SIZE = 20
+
+class GraphError(RuntimeError):
+    pass
+
+class GraphResponse:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.body = body if body is not None else {}
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    @property
+    def text(self):
+        return str(self.body)
+
+class GraphBatch:
+    """
+    Collects operations for one or more $batch calls.
+    Operations that depend on each other must fit in the same batch of 20.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def add(self, method, path, body=None, depends_on=None, op_id=None):
+        """
+        Queue an operation; `path` is relative to /v1.0 (e.g. "/users/{id}").
+        Returns the operation id used to look up its response.
+        """
+        op_id = op_id or str(len(self.operations) + 1)
+        op = {"id": op_id, "method": method.upper(), "url": path}
+        if body is not None:
+            op["body"] = body
+            op["headers"] = {"Content-Type": "application/json"}
+        if depends_on:
+            op["dependsOn"] = [depends_on] if isinstance(depends_on, str) else list(depends_on)
+        self.operations.append(op)
+        return op_id
+
+    def _chunks(self):
+        chunk, ids = [], set()
+        for op in self.operations:
+            deps = set(op.get("dependsOn", ()))
+            if len(chunk) >= MAX_BATCH_SIZE:
+                yield chunk
+                chunk, ids = [], set()
+            if not deps <= ids:
+                raise GraphError(f"Operation {op['id']} depends on an operation outside its batch")
+            chunk.append(op)
+            ids.add(op["id"])
+        if chunk:
+            yield chunk
+
+    def execute(self):
+        """
+        Send the queued operations and return {op_id: GraphResponse}.
+        """
+        results = {}
+        for chunk in self._chunks():
+            results.update(self.client.send_batch(chunk))
+        return results
+
+class GraphClient:
+    def __init__(self, base_url=GRAPH_BASE_URL, max_retries=3):
+        self.base_url = base_url
+        self.max_retries = max_retries
+
+    def _headers(self):
+        token = acquire_graph_api_token()
+        if not token:
+            raise GraphError("Unable to acquire Graph API token")
+        return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    def batch(self):
+        return GraphBatch(self)
+
+    def send_batch(self, operations):
+        """
+        POST one $batch request; operations throttled with 429 are retried after their
+        Retry-After (together with anything that depended on them).
+        """
+        pending = list(operations)
+        results = {}
+        for attempt in range(self.max_retries + 1):
+            resp = http_client.post(
+                f"{self.base_url}/$batch", headers=self._headers(), json={"requests": pending}
+            )
+            if resp.status_code == 401:
+                graph_token_provider.invalidate()
+            if resp.status_code != 200:
+                raise GraphError(f"Graph batch request failed: {resp.status_code} {resp.text}")
+            throttled, delay = set(), 0.0
+            for item in resp.json().get("responses", []):
+                status = int(item.get("status", 0))
+                headers = item.get("headers") or {}
+                if status == 429 and attempt < self.max_retries:
+                    throttled.add(item["id"])
+                    try:
+                        delay = max(delay, float(headers.get("Retry-After", 1)))
+                    except (TypeError, ValueError):
+                        delay = max(delay, 1.0)
+                    continue
+                results[item["id"]] = GraphResponse(status, item.get("body"), headers)
+            if not throttled:
+                break
+            # Operations that failed only because a throttled dependency did not run
+            retry_ids = set(throttled)
+            for op in pending:
+                if set(op.get("dependsOn", ())) & retry_ids:
+                    retry_ids.add(op["id"])
+            pending = [self._without_done_deps(op, retry_ids) for op in pending if op["id"] in retry_ids]
+            for op_id in retry_ids:
+                results.pop(op_id, None)
+            logger.warning(f"Graph throttled {len(throttled)} batch operations; retrying in {delay}s")
+            time.sleep(delay)
+        return results
+
+    @staticmethod
+    def _without_done_deps(op, retry_ids):
+        # Dependencies that already succeeded are not part of the retried batch
+        op = dict(op)
+        deps = [d for d in op.pop("dependsOn", ()) if d in retry_ids]
+        if deps:
+            op["dependsOn"] = deps
+        return op
+
+    def request(self, method, path, body=None):
+        """
+        Send a single Graph operation and return a GraphResponse.
+        """
+        resp = http_client.request(
+            method, f"{self.base_url}{path}", headers=self._headers(), json=body
+        )
+        if resp.status_code == 401:
+            graph_token_provider.invalidate()
+        try:
+            data = resp.json() if resp.content else {}
+        except ValueError:
+            data = {"raw": resp.text}
+        return GraphResponse(resp.status_code, data, dict(resp.headers))
+
+graph_client = GraphClient()
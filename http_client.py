@@ -0,0 +1,190 @@
+"""
+Shared outbound HTTP transport. Every Graph, login and Facebook call goes through one
+connection-pooled requests.Session per worker process, with per-host timeouts,
+exponential back-off that honours Retry-After on 429/503, and per-dependency latency
+counters. Async views use the aiohttp equivalents at the bottom of this module.
+"""
+import os
+import time
+import asyncio
+import random
+import threading
+import logging
+from urllib.parse import urlsplit
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Config read-timeout setting per dependency host; other hosts use HTTP_READ_TIMEOUT
+HOST_READ_TIMEOUTS = {
+    "graph.microsoft.com": "HTTP_READ_TIMEOUT_GRAPH",
+    "login.microsoftonline.com": "HTTP_READ_TIMEOUT_LOGIN",
+    "graph.facebook.com": "HTTP_READ_TIMEOUT_FACEBOOK",
+}
+RETRY_STATUSES = (429, 503)
+# Methods that are safe to resend after a connection error
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+_session_lock = threading.Lock()
+_session_state = {"pid": None, "session": None}
+_stats_lock = threading.Lock()
+_stats = {}
+
+def get_session():
+    """
+    Return this process's pooled Session (recreated after a fork).
+    """
+    if _session_state["pid"] != os.getpid():
+        with _session_lock:
+            if _session_state["pid"] != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=Config.HTTP_POOL_MAXSIZE
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session_state.update(pid=os.getpid(), session=session)
+    return _session_state["session"]
+
+def _timeout_for(host):
+    """
+    (connect, read) timeouts in seconds for a dependency host.
+    """
+    read = getattr(Config, HOST_READ_TIMEOUTS.get(host, "HTTP_READ_TIMEOUT"))
+    return Config.HTTP_CONNECT_TIMEOUT, read
+
+def _record(host, elapsed, error):
+    with _stats_lock:
+        entry = _stats.setdefault(
+            host, {"requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        entry["requests"] += 1
+        entry["total_ms"] += elapsed * 1000
+        entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+        if error:
+            entry["errors"] += 1
+
+def _count_retry(host):
+    with _stats_lock:
+        _stats.setdefault(
+            host, {"requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )["retries"] += 1
+
+def dependency_stats():
+    """
+    Return per-host request/error/retry counts and average/max latency in ms.
+    """
+    with _stats_lock:
+        result = {}
+        for host, entry in _stats.items():
+            snapshot = dict(entry)
+            snapshot["avg_ms"] = entry["total_ms"] / entry["requests"] if entry["requests"] else 0.0
+            result[host] = snapshot
+        return result
+
+def _backoff(attempt, resp=None):
+    if resp is not None:
+        try:
+            return min(float(resp.headers.get("Retry-After")), Config.HTTP_MAX_BACKOFF)
+        except (TypeError, ValueError):
+            pass
+    return min(0.5 * (2 ** attempt), Config.HTTP_MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+def request(method, url, max_retries=None, **kwargs):
+    """
+    Send an HTTP request through the shared session and return the final Response.
+    Retries 429/503 (after Retry-After) and connection errors on idempotent methods.
+    """
+    method = method.upper()
+    host = urlsplit(url).hostname or ""
+    kwargs.setdefault("timeout", _timeout_for(host))
+    if max_retries is None:
+        max_retries = Config.HTTP_MAX_RETRIES
+    session = get_session()
+    for attempt in range(max_retries + 1):
+        started = time.monotonic()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _record(host, time.monotonic() - started, True)
+            if attempt >= max_retries or method not in IDEMPOTENT_METHODS:
+                raise
+            _count_retry(host)
+            delay = _backoff(attempt)
+            logger.warning(f"{method} {host} failed; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        _record(host, time.monotonic() - started, resp.status_code >= 500)
+        if resp.status_code in RETRY_STATUSES and attempt < max_retries:
+            _count_retry(host)
+            delay = _backoff(attempt, resp)
+            logger.warning(f"{method} {host} returned {resp.status_code}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        return resp
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+def patch(url, **kwargs):
+    return request("PATCH", url, **kwargs)
+
+def async_session():
+    """
+    Return a new aiohttp.ClientSession. Flask runs each async view in its own event
+    loop, so sessions are opened per request: `async with http_client.async_session()`.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=Config.HTTP_POOL_MAXSIZE)
+    )
+
+async def request_async(session, method, url, max_retries=None, **kwargs):
+    """
+    aiohttp counterpart of request() for async views: same per-host timeouts,
+    429/503 back-off and latency counters. Returns (status, parsed JSON body or None).
+    """
+    method = method.upper()
+    host = urlsplit(url).hostname or ""
+    connect, read = _timeout_for(host)
+    kwargs.setdefault("timeout", aiohttp.ClientTimeout(sock_connect=connect, sock_read=read))
+    if max_retries is None:
+        max_retries = Config.HTTP_MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        started = time.monotonic()
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                try:
+                    body = await resp.json(content_type=None)
+                except ValueError:
+                    body = None
+                status, headers = resp.status, resp.headers
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            _record(host, time.monotonic() - started, True)
+            if attempt >= max_retries or method not in IDEMPOTENT_METHODS:
+                raise
+            _count_retry(host)
+            delay = _backoff(attempt)
+            logger.warning(f"{method} {host} failed; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        _record(host, time.monotonic() - started, status >= 500)
+        if status in RETRY_STATUSES and attempt < max_retries:
+            _count_retry(host)
+            delay = _backoff(attempt, _RetryAfter(headers.get("Retry-After")))
+            logger.warning(f"{method} {host} returned {status}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        return status, body
+
+class _RetryAfter:
+    # Adapts an aiohttp Retry-After value to the shape _backoff expects
+    def __init__(self, value):
+        self.headers = {"Retry-After": value}
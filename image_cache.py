@@ -0,0 +1,148 @@
+"""
+Bounded on-disk LRU cache for hot event images, one directory per worker process.
+Entries are filled while an image is streamed to a client and are revalidated
+against the blob ETag by the caller.
+"""
+import os
+import time
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class DiskLRUCache:
+    def __init__(self, max_bytes, max_item_bytes, base_dir=None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._dir = None
+        self._pid = None
+
+    def _directory(self):
+        # Each worker gets its own directory so concurrent writers never share files
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self.base_dir:
+                        os.makedirs(self.base_dir, exist_ok=True)
+                    self._dir = tempfile.mkdtemp(prefix='ojc-images-', dir=self.base_dir)
+                    self._entries = OrderedDict()
+                    self._size = 0
+                    self._pid = os.getpid()
+                    atexit.register(shutil.rmtree, self._dir, True)
+        return self._dir
+
+    def _path(self, key):
+        return os.path.join(self._directory(), hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        """
+        Return a copy of the entry for `key` (path, etag, content_type, size, checked_at)
+        and mark it most recently used, or None.
+        """
+        self._directory()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry['path']):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry)
+
+    def touch(self, key):
+        """
+        Record that the entry was just revalidated against its source.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['checked_at'] = time.time()
+
+    def discard(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        # Must be called with self._lock held
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry['size']
+        try:
+            os.remove(entry['path'])
+        except OSError:
+            pass
+
+    def writer(self, key, etag, content_type):
+        """
+        Return a CacheWriter that fills the entry for `key` as chunks are written.
+        """
+        return CacheWriter(self, key, etag, content_type)
+
+    def _commit(self, key, tmp_path, etag, content_type, size):
+        path = self._path(key)
+        with self._lock:
+            self._drop(key)
+            os.replace(tmp_path, path)
+            self._entries[key] = {
+                'path': path, 'etag': etag, 'content_type': content_type,
+                'size': size, 'checked_at': time.time()
+            }
+            self._size += size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+
+class CacheWriter:
+    def __init__(self, cache, key, etag, content_type):
+        self.cache = cache
+        self.key = key
+        self.etag = etag
+        self.content_type = content_type
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache._directory(), suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+        self._done = False
+
+    def write(self, chunk):
+        if self._done:
+            return
+        self.size += len(chunk)
+        if self.size > self.cache.max_item_bytes:
+            # Too large to keep; the client stream continues uncached
+            self.abort()
+            return
+        self._file.write(chunk)
+
+    def commit(self):
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        try:
+            self.cache._commit(self.key, self.tmp_path, self.etag, self.content_type, self.size)
+        except OSError:
+            logger.exception(f"Failed to cache image {self.key}")
+            self._remove_tmp()
+
+    def abort(self):
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        self._remove_tmp()
+
+    def _remove_tmp(self):
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
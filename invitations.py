@@ -6,10 +6,10 @@ from datetime import datetime as _dt
 from flask import Blueprint, request, render_template, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from azure_services import invitations_table_client
-from user_services import create_b2c_user, _acquire_graph_api_token
-import requests
-from urllib.parse import quote
-from emails import send_family_invitation_email
+from user_services import create_b2c_user
+from member_directory import get_family_members, EXTENSION_PREFIX
+from membership_index import get_expiration_index
+from emails import queue_family_invitation_email
 import logging
 
 logger = logging.getLogger(__name__)
@@ -76,15 +76,11 @@ def invite_family():
         logger.info(f"Invitation entity upserted with token {token} for {family_email}")
         # Build acceptance link
         link = url_for('invitations.accept_invitation', token=token, _external=True)
-        # DEBUG: send email synchronously to catch any errors
-        try:
-            logger.info(f"[SYNC DEBUG] sending family invitation email to {family_email} with link {link}")
-            send_family_invitation_email(family_email, family_name, link)
-            logger.info(f"[SYNC DEBUG] family invitation email sent successfully to {family_email}")
-        except Exception:
-            logger.exception("[SYNC DEBUG] error sending family invitation email synchronously")
-            # Propagate error to trigger a 500 response
-            raise
+        # Queue the email; the outbox worker delivers it with retries
+        queue_family_invitation_email(
+            family_email, family_name, link, idempotency_key=f"invite-{token}"
+        )
+        logger.info(f"Family invitation email queued for {family_email}")
         # Return success response
         return jsonify({'message': 'Invitation sent successfully!'}), 200
     except Exception as e:
@@ -104,31 +100,52 @@ def delete_data():
 def family_members():
     """
     Return family members (B2C users) associated with the current user's membership number.
+    Served from the in-process membership number index over the member directory.
     """
-    # Acquire Graph API token
-    token = _acquire_graph_api_token()
-    if not token:
-        return jsonify({'error': 'Unable to acquire Graph API token'}), 500
-    # Build Graph API request to filter users by MembershipNumber extension attribute
-    membership_number = current_user.membership_number
-    filter_str = f"extension_b32ce28f40e2412fb56abae06a1ac8ab_MembershipNumber eq '{membership_number}'"
-    # URL-encode the filter string
-    encoded_filter = quote(filter_str)
-    # Include userPrincipalName in select to filter out the current user
-    select_fields = 'displayName,mailNickname,userPrincipalName'
-    url = (
-        f"https://graph.microsoft.com/v1.0/users"
-        f"?$filter={encoded_filter}"
-        f"&$select={select_fields}"
-    )
-    resp = requests.get(url, headers={'Authorization': f'Bearer {token}'})
-    if resp.status_code != 200:
-        return jsonify({'error': resp.text}), resp.status_code
-    members = resp.json().get('value', [])
+    members = get_family_members(current_user.membership_number)
     # Filter out the signed-in user (membership number matches but not a family member)
     current_user_upn = (
         f"{current_user.email.replace('@', '_at_')}@oviedojeepclub.onmicrosoft.com"
-    )
-    filtered = [m for m in members if m.get('userPrincipalName') != current_user_upn]
+    ).lower()
+    filtered = [
+        {
+            'displayName': m.get('displayName'),
+            'mailNickname': m.get('mailNickname'),
+            'userPrincipalName': m.get('userPrincipalName')
+        }
+        for m in members
+        if (m.get('userPrincipalName') or '').lower() != current_user_upn
+    ]
     # Return remaining family members
-    return jsonify(filtered)
\ No newline at end of file
+    return jsonify(filtered)
+
+def _member_summary(member, index):
+    return {
+        'id': member.get('id'),
+        'displayName': member.get('displayName'),
+        'email': (member.get('mailNickname') or '').replace('_at_', '@'),
+        'membershipNumber': member.get(f"{EXTENSION_PREFIX}MembershipNumber"),
+        'expirationDate': index.expiration_date(member).isoformat(),
+        'accountEnabled': member.get('accountEnabled', True)
+    }
+
+@invitations_bp.route('/members/expirations')
+@login_required
+def member_expirations():
+    """
+    Board query over the membership expiration index.
+    ?within_days=N lists members expiring in the next N days (default 30);
+    ?status=expired_enabled lists lapsed members whose accounts are still enabled.
+    """
+    if current_user.job_title != 'OJC Board Member':
+        return jsonify({'error': 'Not authorized'}), 403
+    index = get_expiration_index()
+    if request.args.get('status') == 'expired_enabled':
+        members = index.expired_but_enabled()
+    else:
+        try:
+            within_days = int(request.args.get('within_days', 30))
+        except ValueError:
+            return jsonify({'error': 'within_days must be an integer'}), 400
+        members = index.expiring_within(within_days)
+    return jsonify([_member_summary(m, index) for m in members])
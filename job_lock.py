@@ -0,0 +1,144 @@
+"""
+Distributed job lock for scheduled jobs. Every gunicorn worker (and every App Service
+instance) runs its own APScheduler; run_exclusive makes sure a job body runs on exactly
+one of them per schedule slot. Production uses Azure Blob leases (renewed while the job
+runs) and records the last start/success time in blob metadata; local runs can use a
+file lock instead (JOB_LOCK_BACKEND=file).
+"""
+import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+import logging
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError, ResourceExistsError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class BlobJobLock:
+    def __init__(self, job_id):
+        from azure_services import blob_service_client
+        self.service = blob_service_client
+        self.blob = blob_service_client.get_blob_client(
+            container=Config.JOB_LOCK_CONTAINER, blob=f"{job_id}.lock"
+        )
+        self.lease = None
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def _ensure_blob(self):
+        try:
+            self.service.create_container(Config.JOB_LOCK_CONTAINER)
+        except ResourceExistsError:
+            pass
+        try:
+            self.blob.upload_blob(b"", overwrite=False)
+        except ResourceExistsError:
+            pass
+
+    def acquire(self):
+        for attempt in range(2):
+            try:
+                self.lease = self.blob.acquire_lease(lease_duration=Config.JOB_LOCK_LEASE_SECONDS)
+                break
+            except ResourceNotFoundError:
+                if attempt:
+                    raise
+                self._ensure_blob()
+            except HttpResponseError as e:
+                if e.status_code == 409:
+                    return False
+                raise
+        self._renewer = threading.Thread(target=self._renew_loop, daemon=True)
+        self._renewer.start()
+        return True
+
+    def _renew_loop(self):
+        while not self._stop.wait(Config.JOB_LOCK_LEASE_SECONDS / 3):
+            try:
+                self.lease.renew()
+            except Exception:
+                logger.exception("Failed to renew job lease")
+
+    def read_state(self):
+        return dict(self.blob.get_blob_properties().metadata or {})
+
+    def write_state(self, **values):
+        metadata = self.read_state()
+        metadata.update({k: str(v) for k, v in values.items()})
+        self.blob.set_blob_metadata(metadata, lease=self.lease)
+
+    def release(self):
+        self._stop.set()
+        if self.lease is not None:
+            try:
+                self.lease.release()
+            except Exception:
+                logger.exception("Failed to release job lease")
+
+class FileJobLock:
+    def __init__(self, job_id):
+        base = os.path.join(tempfile.gettempdir(), f"ojc-job-{job_id}")
+        self.lock_path = base + ".lock"
+        self.state_path = base + ".json"
+        self._file = None
+
+    def acquire(self):
+        self._file = open(self.lock_path, "w")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+
+    def read_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_state(self, **values):
+        state = self.read_state()
+        state.update({k: str(v) for k, v in values.items()})
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+def _make_lock(job_id):
+    if Config.JOB_LOCK_BACKEND == "file":
+        return FileJobLock(job_id)
+    return BlobJobLock(job_id)
+
+def run_exclusive(job_id, func, min_interval):
+    """
+    Run `func` unless another worker holds the lock for `job_id` or already started it
+    within the last `min_interval` seconds. Returns func's result, or None when skipped.
+    """
+    lock = _make_lock(job_id)
+    if not lock.acquire():
+        logger.info(f"Job {job_id} is running elsewhere; skipping")
+        return None
+    try:
+        state = lock.read_state()
+        last_started = float(state.get("last_started") or 0)
+        now = time.time()
+        if now - last_started < min_interval:
+            logger.info(f"Job {job_id} already ran at {last_started}; skipping")
+            return None
+        lock.write_state(last_started=now)
+        result = func()
+        lock.write_state(last_success=time.time())
+        return result
+    finally:
+        lock.release()
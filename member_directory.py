@@ -0,0 +1,237 @@
+"""
+Member directory: a locally persisted JSON snapshot of B2C members kept current with
+Microsoft Graph `/users/delta`. The first sync pulls every user; later syncs replay
+the stored delta link and only transfer what changed.
+"""
+import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+import logging
+import http_client
+from config import Config
+from graph_auth import acquire_graph_api_token
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_PREFIX = "extension_b32ce28f40e2412fb56abae06a1ac8ab_"
+MEMBER_FIELDS = (
+    "id,displayName,mailNickname,userPrincipalName,accountEnabled,"
+    f"{EXTENSION_PREFIX}MembershipNumber,"
+    f"{EXTENSION_PREFIX}MemberJoinedDate,"
+    f"{EXTENSION_PREFIX}MemberExpirationDate"
+)
+DELTA_URL = f"https://graph.microsoft.com/v1.0/users/delta?$select={MEMBER_FIELDS}&$top=999"
+
+# In-memory copy of the snapshot file, reloaded when another worker rewrites it
+_state = {"mtime": None, "snapshot": None}
+_state_lock = threading.Lock()
+
+# membership number -> member records, rebuilt when the snapshot changes
+_family_index = {"snapshot": None, "by_number": None, "checked_at": 0.0}
+_family_index_lock = threading.Lock()
+
+# Background refresh started by readers that found a stale snapshot
+_refresh_state = {"thread": None}
+_refresh_lock = threading.Lock()
+
+def _snapshot_path():
+    return Config.MEMBER_DIRECTORY_PATH or os.path.join(
+        tempfile.gettempdir(), "ojc-member-directory.json"
+    )
+
+def _empty_snapshot():
+    return {"delta_link": None, "synced_at": 0, "members": {}}
+
+def _read_snapshot():
+    path = _snapshot_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return _empty_snapshot()
+    with _state_lock:
+        if _state["mtime"] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                _state["snapshot"] = json.load(f)
+            _state["mtime"] = mtime
+        return _state["snapshot"]
+
+def _write_snapshot(snapshot):
+    path = _snapshot_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    with _state_lock:
+        _state["snapshot"] = snapshot
+        _state["mtime"] = os.path.getmtime(path)
+
+def _fetch_delta(url, headers):
+    """
+    Follow a delta round to its end. Returns (changes, delta_link);
+    raises LookupError when Graph no longer recognises the delta token.
+    """
+    changes = []
+    resuming = "deltatoken" in url.lower()
+    while url:
+        resp = http_client.get(url, headers=headers)
+        if resuming and resp.status_code in (400, 410):
+            raise LookupError(f"Delta token rejected: {resp.status_code}")
+        resuming = False
+        if resp.status_code != 200:
+            raise RuntimeError(f"Graph delta query failed: {resp.status_code} {resp.text}")
+        data = resp.json()
+        changes.extend(data.get("value", []))
+        if "@odata.deltaLink" in data:
+            return changes, data["@odata.deltaLink"]
+        url = data.get("@odata.nextLink")
+    raise RuntimeError("Graph delta query ended without a delta link")
+
+def _apply_changes(members, changes):
+    added = updated = removed = 0
+    for change in changes:
+        user_id = change.get("id")
+        if not user_id:
+            continue
+        if "@removed" in change:
+            if members.pop(user_id, None) is not None:
+                removed += 1
+            continue
+        record = {k: v for k, v in change.items() if not k.startswith("@")}
+        if user_id in members:
+            # Delta responses may carry only the properties that changed
+            members[user_id].update(record)
+            updated += 1
+        else:
+            members[user_id] = record
+            added += 1
+    return added, updated, removed
+
+def sync_member_directory(force_full=False):
+    """
+    Bring the snapshot up to date with Graph and persist it.
+    Returns a dict with added/updated/removed counts and whether a full pull was done.
+    """
+    token = acquire_graph_api_token()
+    if not token:
+        raise RuntimeError("Unable to acquire Graph API token")
+    headers = {"Authorization": f"Bearer {token}"}
+    path = _snapshot_path()
+    with open(path + ".lock", "w") as lock_file:
+        # One sync at a time across workers; later arrivals reuse the fresh result
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            snapshot = _read_snapshot()
+            if (not force_full and snapshot["delta_link"] and
+                    time.time() - snapshot["synced_at"] < Config.MEMBER_DIRECTORY_MIN_SYNC_SECONDS):
+                return {"added": 0, "updated": 0, "removed": 0, "full": False, "skipped": True}
+            full = force_full or not snapshot["delta_link"]
+            members = {} if full else dict((k, dict(v)) for k, v in snapshot["members"].items())
+            try:
+                changes, delta_link = _fetch_delta(
+                    DELTA_URL if full else snapshot["delta_link"], headers
+                )
+            except LookupError:
+                logger.warning("Member directory delta token expired; doing a full sync")
+                full, members = True, {}
+                changes, delta_link = _fetch_delta(DELTA_URL, headers)
+            added, updated, removed = _apply_changes(members, changes)
+            _write_snapshot({"delta_link": delta_link, "synced_at": time.time(), "members": members})
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    logger.info(
+        f"Member directory synced ({'full' if full else 'delta'}): "
+        f"{added} added, {updated} updated, {removed} removed, {len(members)} total"
+    )
+    return {"added": added, "updated": updated, "removed": removed, "full": full, "skipped": False}
+
+def _background_sync():
+    try:
+        sync_member_directory()
+    except Exception:
+        logger.exception("Background member directory sync failed")
+
+def _start_background_sync():
+    with _refresh_lock:
+        thread = _refresh_state["thread"]
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=_background_sync, name="member-directory-sync", daemon=True)
+        _refresh_state["thread"] = thread
+        thread.start()
+
+def get_directory_snapshot(max_age=None):
+    """
+    Return the current snapshot dict (delta_link, synced_at, members). A snapshot older
+    than `max_age` seconds is still served while a background sync refreshes it; only
+    a worker with no snapshot at all syncs inline. The same object is returned until it
+    changes, so callers can key derived indexes on its identity. It must not be mutated.
+    """
+    if max_age is None:
+        max_age = Config.MEMBER_DIRECTORY_MAX_AGE
+    snapshot = _read_snapshot()
+    if time.time() - snapshot["synced_at"] <= max_age:
+        return snapshot
+    if snapshot["synced_at"]:
+        _start_background_sync()
+        return snapshot
+    try:
+        sync_member_directory()
+    except Exception:
+        logger.exception("Member directory sync failed; serving an empty directory")
+    return _read_snapshot()
+
+def get_members(max_age=None):
+    """
+    Return the member records from the snapshot, refreshing it in the background if it
+    is older than `max_age` seconds (default MEMBER_DIRECTORY_MAX_AGE). Records must
+    not be mutated.
+    """
+    return list(get_directory_snapshot(max_age)["members"].values())
+
+def upsert_member(record):
+    """
+    Write a member record straight into the snapshot (e.g. right after creating the
+    user in B2C) so every worker sees it before the next delta sync.
+    """
+    path = _snapshot_path()
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            snapshot = _read_snapshot()
+            members = dict(snapshot["members"])
+            members[record["id"]] = dict(members.get(record["id"], {}), **record)
+            _write_snapshot(dict(snapshot, members=members))
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    invalidate_family_index()
+
+def invalidate_family_index():
+    with _family_index_lock:
+        _family_index.update(snapshot=None, by_number=None, checked_at=0.0)
+
+def get_family_members(membership_number):
+    """
+    Return the member records sharing `membership_number`.
+    The index is reused for FAMILY_INDEX_TTL seconds before the snapshot is re-checked,
+    and rebuilt only when the snapshot has actually changed.
+    """
+    if not membership_number:
+        return []
+    now = time.time()
+    with _family_index_lock:
+        if _family_index["by_number"] is not None and now - _family_index["checked_at"] < Config.FAMILY_INDEX_TTL:
+            return list(_family_index["by_number"].get(membership_number, ()))
+    snapshot = get_directory_snapshot()
+    with _family_index_lock:
+        if _family_index["snapshot"] is not snapshot or _family_index["by_number"] is None:
+            by_number = {}
+            for member in snapshot["members"].values():
+                number = member.get(f"{EXTENSION_PREFIX}MembershipNumber")
+                if number:
+                    by_number.setdefault(number, []).append(member)
+            _family_index.update(snapshot=snapshot, by_number=by_number)
+        _family_index["checked_at"] = now
+        return list(_family_index["by_number"].get(membership_number, ()))
@@ -0,0 +1,106 @@
+"""
+Membership expiration index: member expiration timestamps normalized once into NumPy
+arrays and bucketed by UTC expiration day, so the daily reminder job and board queries
+are dictionary lookups or binary searches instead of a walk over every user.
+"""
+import threading
+from datetime import datetime, date, timedelta, timezone
+import numpy as np
+
+from member_directory import EXTENSION_PREFIX, get_directory_snapshot
+
+EXPIRATION_FIELD = f"{EXTENSION_PREFIX}MemberExpirationDate"
+_EPOCH = date(1970, 1, 1)
+
+def _day_number(day):
+    return (day - _EPOCH).days
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class ExpirationIndex:
+    def __init__(self, members):
+        members = list(members)
+        raw = np.array([_to_float(m.get(EXPIRATION_FIELD)) for m in members], dtype=np.float64)
+        # Stored values are a mix of seconds and milliseconds
+        seconds = np.where(raw > 1e10, raw / 1000.0, raw)
+        valid = np.isfinite(seconds) & (seconds > 0)
+        self.members = [m for m, ok in zip(members, valid) if ok]
+        self.expires_at = seconds[valid]
+        self.enabled = np.array(
+            [m.get("accountEnabled", True) is not False for m in self.members], dtype=bool
+        )
+        days = np.floor(self.expires_at / 86400.0).astype(np.int64)
+        self.order = np.argsort(days, kind="stable")
+        self.sorted_days = days[self.order]
+        unique_days, starts, counts = np.unique(
+            self.sorted_days, return_index=True, return_counts=True
+        )
+        # expiration day number -> positions into self.order
+        self.buckets = {
+            int(day): (int(start), int(start + count))
+            for day, start, count in zip(unique_days, starts, counts)
+        }
+
+    def __len__(self):
+        return len(self.members)
+
+    def _take(self, positions):
+        return [self.members[i] for i in positions]
+
+    def expiring_on(self, day):
+        """
+        Members whose membership expires on the given UTC date.
+        """
+        span = self.buckets.get(_day_number(day))
+        if span is None:
+            return []
+        return self._take(self.order[span[0]:span[1]])
+
+    def expiring_between(self, first_day, last_day):
+        """
+        Members expiring between two UTC dates, inclusive, soonest first.
+        """
+        lo = np.searchsorted(self.sorted_days, _day_number(first_day), side="left")
+        hi = np.searchsorted(self.sorted_days, _day_number(last_day), side="right")
+        return self._take(self.order[lo:hi])
+
+    def expiring_within(self, days, today=None):
+        """
+        Members expiring in the next `days` days (today included), soonest first.
+        """
+        today = today or datetime.utcnow().date()
+        return self.expiring_between(today, today + timedelta(days=days))
+
+    def expired_but_enabled(self, today=None):
+        """
+        Members whose membership has lapsed but whose account is still enabled.
+        """
+        today = today or datetime.utcnow().date()
+        hi = np.searchsorted(self.sorted_days, _day_number(today), side="left")
+        positions = self.order[:hi]
+        return self._take(positions[self.enabled[positions]])
+
+    def expiration_date(self, member):
+        ts = _to_float(member.get(EXPIRATION_FIELD))
+        if ts > 1e10:
+            ts /= 1000.0
+        return datetime.fromtimestamp(ts, tz=timezone.utc).date()
+
+_index_state = {"snapshot": None, "index": None}
+_index_lock = threading.Lock()
+
+def get_expiration_index():
+    """
+    Return the ExpirationIndex for the current member directory snapshot,
+    rebuilding it only when the snapshot has changed.
+    """
+    snapshot = get_directory_snapshot()
+    with _index_lock:
+        if _index_state["snapshot"] is not snapshot:
+            _index_state["index"] = ExpirationIndex(snapshot["members"].values())
+            _index_state["snapshot"] = snapshot
+        return _index_state["index"]
@@ -6,7 +6,7 @@ from flask import Blueprint, request, render_template, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from azure_services import square_client
 from user_services import create_b2c_user, create_membership_details
-from emails import send_new_membership_email, send_membership_renewal_email
+from emails import queue_new_membership_email, queue_membership_renewal_email
 from config import Config
 
 payments_bp = Blueprint('payments', __name__)
@@ -57,7 +57,9 @@ def pay():
     membership_number, join_date, expiration_date = create_membership_details()
     try:
         create_b2c_user(email, name, password, membership_number, join_date, expiration_date)
-        send_new_membership_email(email, name, receipt)
+        queue_new_membership_email(
+            email, name, receipt, idempotency_key=f"welcome-{membership_number}"
+        )
         flash('Account created successfully. Please sign in.', 'success')
     except Exception as e:
         flash(f'Error creating account: {e}', 'danger')
@@ -79,7 +81,11 @@ def renew_membership():
     if not result.is_success():
         return jsonify(success=False, message='Payment failed'), 400
     # Update expiration date in B2C (omitted for brevity)
-    send_membership_renewal_email(current_user.email, current_user.name)
+    payment_id = result.body.get('payment', {}).get('id')
+    queue_membership_renewal_email(
+        current_user.email, current_user.name,
+        idempotency_key=f"renewal-{payment_id}" if payment_id else None
+    )
     return jsonify(success=True, message='Membership renewed successfully')
 
 @payments_bp.route('/webhook/square', methods=['POST'])
@@ -0,0 +1,95 @@
+"""
+Per-worker cache of serialized JSON responses. Each view is encoded once per data
+version and kept as raw, gzip and (when the brotli package is installed) brotli bytes
+with a strong ETag; requests are answered by content negotiation or a 304.
+"""
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+class EncodedResponse:
+    def __init__(self, body):
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encodings = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.encodings["gzip"] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(body, quality=9)
+
+    def respond(self):
+        """
+        Build the Flask response for the current request.
+        """
+        if request.if_none_match.contains(self.etag):
+            resp = Response(status=304)
+        else:
+            encoding = self._negotiate()
+            resp = Response(self.encodings[encoding], mimetype="application/json")
+            if encoding != "identity":
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(self.etag)
+        resp.headers["Vary"] = "Accept-Encoding"
+        # Member-only data: browsers may keep it but must revalidate every time
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+        return resp
+
+    def _negotiate(self):
+        accepted = request.accept_encodings
+        best, best_quality = "identity", 0
+        # Preference order when the client weighs encodings equally
+        for encoding in ("br", "gzip"):
+            quality = accepted[encoding]
+            if encoding in self.encodings and quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+class JSONResponseCache:
+    """
+    LRU of EncodedResponse entries for a single data version. Versions only grow:
+    seeing a newer one drops every entry built from the old one, and responses built
+    from an older one are returned without being stored.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self._version:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, version, key, payload):
+        """
+        Serialize and encode `payload`, store it under (version, key) and return it.
+        """
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        entry = EncodedResponse(body)
+        with self._lock:
+            if self._version is not None and version < self._version:
+                return entry
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,136 @@
+"""
+Session validity cache: remembers whether signed-in accounts still exist in B2C so the
+per-request session check is an in-memory lookup. A background thread re-verifies
+known accounts in batches; results (positive and negative) are trusted for at most
+`ttl` seconds, after which the request path falls back to a synchronous check.
+"""
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SessionValidityCache:
+    def __init__(self, batch_check, ttl=300, recheck_interval=60,
+                 idle_timeout=3600, batch_size=15):
+        """
+        batch_check: callable taking a list of keys and returning {key: bool}; it
+        should raise when the lookup itself fails so cached results are kept.
+        """
+        self.batch_check = batch_check
+        self.ttl = ttl
+        self.recheck_interval = recheck_interval
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        # key -> {'valid', 'checked_at', 'last_seen', 'pending'}
+        self._entries = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so start one lazily in each worker process
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='session-validity', daemon=True
+            )
+            self._thread.start()
+
+    def mark(self, key, valid=True):
+        """
+        Record a known result, e.g. right after a successful sign-in.
+        """
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                'valid': valid, 'checked_at': now, 'last_seen': now, 'pending': False
+            }
+
+    def forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def is_valid(self, key):
+        """
+        Return the cached validity for `key`. Unknown keys are trusted provisionally
+        and queued for the background checker; entries older than `ttl` are
+        re-checked synchronously so a deleted account is forced out within `ttl`.
+        """
+        self._ensure_worker()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = {
+                    'valid': True, 'checked_at': now, 'last_seen': now, 'pending': True
+                }
+                self._wake.set()
+                return True
+            entry['last_seen'] = now
+            if now - entry['checked_at'] <= self.ttl:
+                return entry['valid']
+        return self._check_now(key)
+
+    def _check_now(self, key):
+        try:
+            valid = bool(self.batch_check([key]).get(key, False))
+        except Exception:
+            logger.exception("Synchronous session validity check failed")
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    return True
+                # Back off so an outage does not turn every request into a Graph call
+                entry['checked_at'] = time.time() - self.ttl + self.recheck_interval
+                return entry['valid']
+        self.mark(key, valid)
+        return valid
+
+    def _due_keys(self):
+        now = time.time()
+        due = []
+        with self._lock:
+            for key in list(self._entries):
+                entry = self._entries[key]
+                if now - entry['last_seen'] > self.idle_timeout:
+                    del self._entries[key]
+                elif entry['pending'] or now - entry['checked_at'] >= self.recheck_interval:
+                    due.append(key)
+        return due
+
+    def refresh(self):
+        """
+        Re-check every due entry against the backing store, `batch_size` keys at a time.
+        """
+        due = self._due_keys()
+        for i in range(0, len(due), self.batch_size):
+            batch = due[i:i + self.batch_size]
+            try:
+                results = self.batch_check(batch)
+            except Exception:
+                logger.exception("Background session validity check failed")
+                continue
+            now = time.time()
+            with self._lock:
+                for key in batch:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        entry['valid'] = bool(results.get(key, False))
+                        entry['checked_at'] = now
+                        entry['pending'] = False
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.recheck_interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Session validity refresh loop error")
@@ -32,22 +32,39 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
-    // Function to load events from the blob
-    function loadBlobEvents() {
-        fetch('/blob-events')
+    // Replace any existing "Load more" button with one for the next page (if any)
+    function showLoadMore(nextCursor, loadPage) {
+        const existing = eventsContent.querySelector('.load-more-events-btn');
+        if (existing) existing.remove();
+        if (!nextCursor) return;
+        const button = document.createElement('button');
+        button.classList.add('load-more-events-btn');
+        button.textContent = 'Load more';
+        button.addEventListener('click', () => loadPage(nextCursor));
+        eventsContent.appendChild(button);
+    }
+
+    function eventsPageUrl(path, cursor) {
+        const params = new URLSearchParams();
+        if (cursor) params.set('cursor', cursor);
+        const query = params.toString();
+        return query ? `${path}?${query}` : path;
+    }
+
+    // Function to load upcoming events from the blob, one page at a time (soonest first)
+    function loadBlobEvents(cursor) {
+        fetch(eventsPageUrl('/blob-events', cursor))
             .then(response => response.json())
             .then(data => {
-                eventsContent.innerHTML = '';
+                if (!cursor) eventsContent.innerHTML = '';
                 if (data.error) {
                     eventsContent.innerHTML = `<p>Error: ${data.error}</p>`;
                     return;
                 }
-                if (data.length === 0) {
+                if (!cursor && data.events.length === 0) {
                     eventsContent.innerHTML = '<p>No events found.</p>';
                 } else {
-                    // Sort upcoming events so the soonest start_time appears first
-                    data.sort((a, b) => new Date(a.start_time) - new Date(b.start_time));
-                    data.forEach(event => {
+                    data.events.forEach(event => {
                         const eventDiv = document.createElement('div');
                         eventDiv.classList.add('event');
                         const startDate = new Date(event.start_time).toLocaleString();
@@ -82,6 +99,7 @@ document.addEventListener('DOMContentLoaded', function () {
                         eventsContent.appendChild(eventDiv);
                     });
                 }
+                showLoadMore(data.next_cursor, loadBlobEvents);
             })
             .catch(error => {
                 console.error("Error loading blob events", error);
@@ -89,12 +107,12 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     }
 
-    // Function to load old events from the blob
-    function loadOldEvents() {
-        fetch('/list_old_events', { method: 'GET' }) // Force GET request
+    // Function to load old events from the blob, one page at a time (newest first)
+    function loadOldEvents(cursor) {
+        fetch(eventsPageUrl('/list_old_events', cursor), { method: 'GET' }) // Force GET request
             .then(response => response.json())
             .then(data => {
-                eventsContent.innerHTML = ''; // Clear existing events
+                if (!cursor) eventsContent.innerHTML = ''; // Clear existing events
         
                 if (data.error) {
                     console.error("Error loading old events:", data.error);
@@ -102,7 +120,7 @@ document.addEventListener('DOMContentLoaded', function () {
                     return;
                 }
     
-                if (data.events.length === 0) {
+                if (!cursor && data.events.length === 0) {
                     eventsContent.innerHTML = '<p>No past events found.</p>';
                 } else {
                     data.events.forEach(event => {
@@ -141,6 +159,7 @@ document.addEventListener('DOMContentLoaded', function () {
                         eventsContent.appendChild(eventDiv);
                     });
                 }
+                showLoadMore(data.next_cursor, loadOldEvents);
             })
             .catch(error => {
                 console.error("Error loading old events:", error);
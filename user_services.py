@@ -1,49 +1,28 @@
 """
 User services module: provides operations around Azure B2C user data, including:
-  - Fetching all users with membership expiration via Microsoft Graph
+  - Listing all users with membership expiration (via the member directory snapshot)
   - Computing standard membership expiration dates
   - Generating membership details (number, join date, expiration)
   - Creating B2C users and updating their extension attributes
   - Scheduled job to check and email users about upcoming expiration
 """
 import time
-import msal
-import requests
+import logging
 from datetime import datetime
-from config import Config
+from graph_client import graph_client
+from member_directory import get_members, upsert_member
 
-def _acquire_graph_api_token():
-    authority_url = f"https://login.microsoftonline.com/{Config.TENANT_ID}"
-    app = msal.ConfidentialClientApplication(
-        Config.CLIENT_ID,
-        client_credential=Config.CLIENT_SECRET,
-        authority=authority_url
-    )
-    result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    return result.get("access_token")
+logger = logging.getLogger(__name__)
+
+# Retries of the attribute update while a just-created user is not yet visible (404)
+CREATE_UPDATE_RETRIES = 3
 
 def get_all_users():
     """
-    Fetch all users from Microsoft Graph with membership expiration.
+    Return all users with membership expiration from the member directory snapshot,
+    which is kept current with incremental Graph delta syncs.
     """
-    token = _acquire_graph_api_token()
-    if not token:
-        return []
-    headers = {"Authorization": f"Bearer {token}"}
-    select_fields = (
-        "id,displayName,mailNickname,"
-        "extension_b32ce28f40e2412fb56abae06a1ac8ab_MemberExpirationDate"
-    )
-    url = f"https://graph.microsoft.com/v1.0/users?$select={select_fields}"
-    users = []
-    while url:
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            break
-        data = resp.json()
-        users.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")
-    return users
+    return get_members()
 
 def compute_expiration_date():
     """
@@ -70,12 +49,10 @@ def create_membership_details():
 def create_b2c_user(email, display_name, password,
                     membership_number, join_date, expiration_date):
     """
-    Create a user in Azure B2C via Microsoft Graph.
+    Create a user in Azure B2C via Microsoft Graph, then set its extension attributes.
+    The update addresses the new user by id and is retried while the new object is
+    not yet visible to Graph (replication lag).
     """
-    token = _acquire_graph_api_token()
-    if not token:
-        raise RuntimeError("Unable to acquire Graph API token")
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     mail_nickname = email.replace("@", "_at_")
     upn = f"{mail_nickname}@oviedojeepclub.onmicrosoft.com"
     user_payload = {
@@ -90,89 +67,100 @@ def create_b2c_user(email, display_name, password,
             "issuerAssignedId": email
         }]
     }
-    resp = requests.post("https://graph.microsoft.com/v1.0/users", headers=headers, json=user_payload)
-    if resp.status_code != 201:
-        raise RuntimeError(f"Error creating user: {resp.text}")
-    created = resp.json()
     update_payload = {
         "otherMails": [email],
         "extension_b32ce28f40e2412fb56abae06a1ac8ab_MembershipNumber": membership_number,
         "extension_b32ce28f40e2412fb56abae06a1ac8ab_MemberJoinedDate": join_date,
         "extension_b32ce28f40e2412fb56abae06a1ac8ab_MemberExpirationDate": expiration_date
     }
-    upd = requests.patch(
-        f"https://graph.microsoft.com/v1.0/users/{created['id']}",
-        headers=headers,
-        json=update_payload
-    )
-    if upd.status_code not in (200, 204):
+    resp = graph_client.request("POST", "/users", user_payload)
+    if resp.status != 201:
+        raise RuntimeError(f"Error creating user: {resp.text}")
+    created = resp.body
+    for attempt in range(CREATE_UPDATE_RETRIES + 1):
+        upd = graph_client.request("PATCH", f"/users/{created['id']}", update_payload)
+        if upd.status != 404 or attempt == CREATE_UPDATE_RETRIES:
+            break
+        time.sleep(2 ** attempt)
+    if upd.status not in (200, 204):
         raise RuntimeError(f"Error updating custom attributes: {upd.text}")
+    # Write-through so family lookups see the new member before the next directory sync
+    _record_member(dict(
+        update_payload,
+        id=created['id'],
+        displayName=display_name,
+        mailNickname=mail_nickname,
+        userPrincipalName=upn,
+        accountEnabled=True
+    ))
     return created
    
 def update_b2c_user_email(user_id, new_email):
     """
     Update a user's email in Azure B2C: identities, mailNickname, userPrincipalName, and otherMails.
+    The core update and the identities read share one $batch; the identities update
+    needs that read and follows as a second call.
     """
-    token = _acquire_graph_api_token()
-    if not token:
-        raise RuntimeError("Unable to acquire Graph API token")
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
     # Compute new mailNickname and UPN
     mail_nickname = new_email.replace('@', '_at_')
     user_principal_name = f"{mail_nickname}@oviedojeepclub.onmicrosoft.com"
-    url = f"https://graph.microsoft.com/v1.0/users/{user_id}"
+    path = f"/users/{user_id}"
     # Step 1: update core properties (userPrincipalName, mailNickname, otherMails)
+    # and fetch identities in the same round trip
     patch1 = {
         'userPrincipalName': user_principal_name,
         'mailNickname': mail_nickname,
         'otherMails': [new_email]
     }
-    resp1 = requests.patch(url, headers=headers, json=patch1)
-    if resp1.status_code not in (200, 204):
-        raise RuntimeError(f"Error updating userCore properties: {resp1.text}")
-    # Step 2: fetch and update identities separately
-    resp2 = requests.get(f"{url}?$select=identities", headers=headers)
-    if resp2.status_code != 200:
-        raise RuntimeError(f"Error fetching identities: {resp2.text}")
-    identities = resp2.json().get('identities', [])
+    batch = graph_client.batch()
+    core_id = batch.add("PATCH", path, patch1)
+    idents_id = batch.add("GET", f"{path}?$select=identities")
+    results = batch.execute()
+    resp1 = results.get(core_id)
+    if resp1 is None or resp1.status not in (200, 204):
+        raise RuntimeError(f"Error updating userCore properties: {resp1.text if resp1 else 'no response'}")
+    resp2 = results.get(idents_id)
+    if resp2 is None or resp2.status != 200:
+        raise RuntimeError(f"Error fetching identities: {resp2.text if resp2 else 'no response'}")
+    # Step 2: update identities
+    identities = resp2.body.get('identities', [])
     updated_idents = []
     for ident in identities:
         if ident.get('signInType') == 'emailAddress':
             ident['issuerAssignedId'] = new_email
         updated_idents.append(ident)
     patch2 = {'identities': updated_idents}
-    resp3 = requests.patch(url, headers=headers, json=patch2)
-    if resp3.status_code not in (200, 204):
+    resp3 = graph_client.request("PATCH", path, patch2)
+    if resp3.status not in (200, 204):
         raise RuntimeError(f"Error updating identities: {resp3.text}")
+    _record_member({
+        'id': user_id,
+        'userPrincipalName': user_principal_name,
+        'mailNickname': mail_nickname
+    })
+
+def _record_member(record):
+    try:
+        upsert_member(record)
+    except Exception:
+        logger.exception(f"Failed to write member {record.get('id')} to the member directory")
   
 def check_membership_expiration():
     """
     Scheduled job: send membership expiration reminder emails.
-    Fetches all users, computes days until expiration, and emails them when
-    their membership expires in 15, 8, or 1 days.
+    Looks up the members whose membership expires in 15, 8, or 1 days in the
+    expiration index and emails them.
     """
-    from datetime import datetime as _dt
-    from emails import send_disablement_reminder_email
-    # Get all users with expiration data
-    users = get_all_users()
+    from datetime import datetime as _dt, timedelta
+    from emails import render_disablement_reminder_emails, send_bulk_emails
+    from membership_index import get_expiration_index
+    index = get_expiration_index()
     today = _dt.utcnow().date()
-    for user in users:
-        # Extract raw expiration timestamp
-        exp_raw = user.get('extension_b32ce28f40e2412fb56abae06a1ac8ab_MemberExpirationDate')
-        if not exp_raw:
-            continue
-        # Normalize to seconds
-        ts = exp_raw / 1000 if exp_raw > 1e10 else exp_raw
-        try:
-            exp_date = _dt.fromtimestamp(ts).date()
-        except Exception:
-            continue
-        days_left = (exp_date - today).days
-        if days_left in (15, 8, 1):
+    recipients = []
+    for days_left in (15, 8, 1):
+        for user in index.expiring_on(today + timedelta(days=days_left)):
             # Prepare recipient info
             recipient = user.get('mailNickname', '').replace('_at_', '@')
             name = user.get('displayName', 'Member')
-            send_disablement_reminder_email(recipient, name, days_left)
\ No newline at end of file
+            recipients.append((recipient, name, days_left))
+    send_bulk_emails(render_disablement_reminder_emails(recipients))